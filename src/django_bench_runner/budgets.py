@@ -0,0 +1,71 @@
+"""
+Time budgets for tests and test classes.
+
+Budgets are given in seconds, in the BENCH_BUDGETS setting::
+
+    BENCH_BUDGETS = {
+        'TEST': 0.5,
+        'CLASS': 10,
+        'APPS': {'reports': {'TEST': 2}},
+    }
+
+or with the budget decorator on a test method or class, which takes
+precedence over the settings.
+"""
+import sys
+
+from django.conf import settings
+
+from .rollup import app_name
+
+
+def budget(test=None, total=None):
+    """
+    Gives a test method, or each test of a class, at most `test` seconds,
+    and a class at most `total` seconds with its class-level setup and
+    teardown.
+    """
+
+    def decorate(obj):
+        if test is not None:
+            obj.bench_budget = test
+        if total is not None:
+            obj.bench_class_budget = total
+        return obj
+
+    return decorate
+
+
+class Budgets(object):
+    """
+    Finds the budget of a test or class: from its decorator, then from
+    the settings of its app under 'APPS', then from the global 'TEST'
+    and 'CLASS' settings.
+    """
+
+    def __init__(self, config=None):
+        if config is None:
+            config = getattr(settings, 'BENCH_BUDGETS', {})
+        self.config = config
+        self.modules = {}
+
+    def setting(self, module, key):
+        if module not in self.modules:
+            apps = self.config.get('APPS', {})
+            self.modules[module] = apps.get(app_name(module), {})
+        return self.modules[module].get(key, self.config.get(key))
+
+    def test_budget(self, test):
+        method = getattr(test, test._testMethodName, None)
+        for obj in (method, type(test)):
+            seconds = getattr(obj, 'bench_budget', None)
+            if seconds is not None:
+                return seconds
+        return self.setting(test.__module__, 'TEST')
+
+    def class_budget(self, module, class_name):
+        test_class = getattr(sys.modules.get(module), class_name, None)
+        seconds = getattr(test_class, 'bench_class_budget', None)
+        if seconds is not None:
+            return seconds
+        return self.setting(module, 'CLASS')
@@ -0,0 +1,135 @@
+from collections import defaultdict
+
+from django.core.signals import request_finished, request_started
+from django.template.base import Template
+
+from .clock import clock
+from .collectors import Collector, Metric
+from .tabulate import tabulate
+
+
+def template_label(template):
+    origin = getattr(template, 'origin', None)
+    return (
+        getattr(origin, 'template_name', None) or template.name or '<string>'
+    )
+
+
+class RequestCollector(Collector):
+    """
+    Times the requests each test makes through the test client, and the
+    templates rendered in them.
+
+    Requests are timed from request_started to request_finished, so they
+    include middleware.  The template_rendered signal carries no timing,
+    so Template._render is wrapped instead.  Each template's time is kept
+    both with its includes and without them, and the `top` templates
+    with the most time of their own across the run are listed at the end.
+    """
+
+    metrics = (
+        Metric('Requests', 'requests', '{:d}'),
+        Metric('Request time', 'request_time'),
+        Metric('Render time', 'render_time'),
+    )
+
+    def __init__(self, top=10, rows=3):
+        self.top = top
+        self.rows = rows
+        self.record = None
+        self.request_start = None
+        self.stack = []
+        self.original_render = None
+
+    def request_started(self, **kwargs):
+        self.request_start = clock()
+
+    def request_finished(self, **kwargs):
+        if self.request_start is None:
+            return
+        self.record['requests'] += 1
+        self.record['request_time'] += clock() - self.request_start
+        self.request_start = None
+
+    def render(self, template, context):
+        self.stack.append(0.0)
+        start = clock()
+        try:
+            return self.original_render(template, context)
+        finally:
+            elapsed = clock() - start
+            nested = self.stack.pop()
+            if self.stack:
+                self.stack[-1] += elapsed
+            else:
+                self.record['render_time'] += elapsed
+            # [renders, time with includes, time of its own]
+            stats = self.record['templates'].setdefault(
+                template_label(template), [0, 0.0, 0.0]
+            )
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] += elapsed - nested
+
+    def start_test(self, test, record):
+        record['requests'] = 0
+        record['request_time'] = 0.0
+        record['render_time'] = 0.0
+        record['templates'] = {}
+        self.record = record
+        self.request_start = None
+        self.stack = []
+
+        collector = self
+        self.original_render = Template._render
+        Template._render = (
+            lambda template, context: collector.render(template, context)
+        )
+        request_started.connect(self.request_started)
+        request_finished.connect(self.request_finished)
+
+    def stop_test(self, test, record):
+        request_started.disconnect(self.request_started)
+        request_finished.disconnect(self.request_finished)
+        Template._render = self.original_render
+        self.record = None
+
+    def report_rows(self, record):
+        templates = sorted(
+            record.get('templates', {}).items(),
+            key=lambda item: item[1][2], reverse=True
+        )
+        return [
+            {"Test": label, "Render time": "{:.5f}".format(own)}
+            for label, (renders, total, own) in templates[:self.rows]
+        ]
+
+    def write_report(self, stream, bench_dict, class_dict):
+        renders = defaultdict(int)
+        totals = defaultdict(float)
+        own = defaultdict(float)
+        tests = defaultdict(int)
+        for record in bench_dict.values():
+            for label, stats in record.get('templates', {}).items():
+                renders[label] += stats[0]
+                totals[label] += stats[1]
+                own[label] += stats[2]
+                tests[label] += 1
+        if not own:
+            return
+        stream.writeln()
+        stream.writeln(tabulate(
+            [
+                {
+                    "Slowest templates": label,
+                    "Renders": renders[label],
+                    "Own": own[label],
+                    "With includes": totals[label],
+                    "Tests": tests[label],
+                }
+                for label in sorted(own, key=own.get, reverse=True)[:self.top]
+            ],
+            headers="keys",
+            floatfmt=".5f",
+            aligns=('left', 'right', 'right', 'right', 'right')
+        ))
@@ -0,0 +1,6 @@
+"""
+Durations are measured with a monotonic, high-resolution clock, so they
+can't jump with NTP or DST adjustments of the wall clock.
+"""
+
+from time import perf_counter as clock
@@ -0,0 +1,168 @@
+from collections import OrderedDict
+import operator
+
+from .clock import clock
+from .stream import RecordStream
+
+
+class Metric(object):
+    """
+    A column of the benchmark table backed by one key of each test record.
+    `rollup` combines the values of a class into its totals row.
+    """
+
+    def __init__(self, header, key, fmt='{:.5f}', rollup=operator.add):
+        self.header = header
+        self.key = key
+        self.fmt = fmt
+        self.rollup = rollup
+
+    def format(self, value):
+        if value is None:
+            return ''
+        return self.fmt.format(value)
+
+
+class Collector(object):
+    """
+    Base class for optional measurements taken around each test.
+
+    start_test runs just before a test's clock starts and stop_test just
+    after it stops, so collectors don't count their own overhead.  Values
+    are stored on the test record and shown through `metrics`, or in
+    rows under the test from report_rows, given as dicts of cells by
+    column header with the label under "Test".  write_report can add a
+    section of its own after the table.  finish_test runs once every
+    collector's stop_test has, for work too heavy to do while the others
+    are still measuring the test.
+
+    start_class runs before a class's setUpClass, given the record of its
+    setup, and stop_class before its teardown record is stored.  Both can
+    add to the record they are given.
+    """
+
+    metrics = ()
+
+    def start_class(self, record):
+        pass
+
+    def stop_class(self, record):
+        pass
+
+    def start_test(self, test, record):
+        pass
+
+    def stop_test(self, test, record):
+        pass
+
+    def finish_test(self, test, record):
+        pass
+
+    def report_rows(self, record):
+        return ()
+
+    def write_report(self, stream, bench_dict, class_dict):
+        pass
+
+
+class RecordingMixin(object):
+    """
+    Keeps a timing record for every test a result sees in `bench_dict`
+    and runs the result's collectors around each one.
+
+    With `parallel` set the tests run in worker processes, which record
+    them, so the result only takes records passed back to it.  With
+    `stream`, records are written to that file as soon as they finish
+    instead of being kept in memory.
+
+    With `repeat` set, a test that runs more than once keeps the runtimes
+    of all its runs under 'runs' in its record.  Collector values are
+    those of its last run.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.benchmark = kwargs.pop('benchmark', False)
+        self.collectors = kwargs.pop('collectors', ())
+        self.parallel = kwargs.pop('parallel', False)
+        self.repeat = kwargs.pop('repeat', False)
+        stream = kwargs.pop('stream', None)
+        super(RecordingMixin, self).__init__(*args, **kwargs)
+        self.bench_dict = OrderedDict()
+        self.class_dict = OrderedDict()
+        self.record_stream = RecordStream(stream) if stream else None
+        self.runs = {}
+
+    def parseTest(self, test):
+        module = test.__module__
+        class_name = test.__class__.__name__
+        test_name = test._testMethodName
+        uniq = "{}.{}.{}".format(module, class_name, test_name)
+        return uniq, module, class_name, test_name
+
+    def addClassBench(self, test, record, uniq=None):
+        """Stores class-level setup or teardown timings."""
+        if uniq is None:
+            uniq = "{}.{}".format(record['module'], record['class_name'])
+        if 'teardown' in record and self.benchmark and not self.parallel:
+            for collector in self.collectors:
+                collector.stop_class(record)
+        if self.record_stream:
+            # Workers write their own records to the stream
+            if not self.parallel:
+                self.record_stream.write_class(uniq, record)
+            return
+        self.class_dict.setdefault(uniq, {}).update(record)
+
+    def startClassBench(self, test, record):
+        """Runs the collectors before a class is set up."""
+        if self.benchmark and not self.parallel:
+            for collector in self.collectors:
+                collector.start_class(record)
+
+    def new_record(self, test):
+        uniq, module, class_name, test_name = self.parseTest(test)
+        return {
+            'test_name': test_name,
+            'class_name': class_name,
+            'module': module,
+        }
+
+    def startTest(self, test):
+        # Run at start of each test method
+        if self.parallel:
+            return super(RecordingMixin, self).startTest(test)
+
+        uniq = self.parseTest(test)[0]
+        record = self.new_record(test)
+        self.bench_dict[uniq] = record
+        # Written before anything is measured, so the test isn't charged
+        if self.record_stream:
+            self.record_stream.write_start(uniq, clock())
+        if self.benchmark:
+            for collector in self.collectors:
+                collector.start_test(test, record)
+        record['start'] = clock()
+        super(RecordingMixin, self).startTest(test)
+
+    def stopTest(self, test):
+        super(RecordingMixin, self).stopTest(test)
+        if self.parallel:
+            return None
+
+        uniq = self.parseTest(test)[0]
+        record = self.bench_dict[uniq]
+        record['stop'] = clock()
+        if self.repeat:
+            runs = self.runs.setdefault(uniq, [])
+            runs.append(record['stop'] - record['start'])
+            if len(runs) > 1:
+                record['runs'] = runs
+        if self.benchmark:
+            for collector in reversed(self.collectors):
+                collector.stop_test(test, record)
+            for collector in self.collectors:
+                collector.finish_test(test, record)
+        if self.record_stream:
+            self.record_stream.write_test(uniq, record)
+            del self.bench_dict[uniq]
+        return record
@@ -0,0 +1,92 @@
+import os
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from .collectors import Collector, Metric
+from .tabulate import tabulate
+
+
+def cpu_usage():
+    """
+    User and system CPU seconds used by this process so far, with its
+    voluntary and involuntary context switches where they're known.
+    """
+    if resource is not None:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        return usage.ru_utime, usage.ru_stime, usage.ru_nvcsw, usage.ru_nivcsw
+    times = os.times()
+    return times[0], times[1], None, None
+
+
+class CpuCollector(Collector):
+    """
+    Splits each test's runtime into CPU time and time spent waiting, on
+    the database, the network, sleeps or locks.
+
+    Tests using at least `cpu_bound` of their runtime on the CPU are
+    marked "cpu", the rest "wait".  Voluntary context switches count how
+    often the process blocked; they need the resource module.
+    """
+
+    metrics = (
+        Metric('CPU', 'cpu_time'),
+        Metric('Wait', 'wait_time'),
+        Metric('Switches', 'voluntary_switches', '{:d}'),
+        Metric(
+            'Bound', 'bound', '{}',
+            rollup=lambda total, value: total if total == value else 'mixed'
+        ),
+    )
+
+    def __init__(self, cpu_bound=0.5):
+        self.cpu_bound = cpu_bound
+        self.usage = None
+
+    def start_test(self, test, record):
+        self.usage = cpu_usage()
+
+    def stop_test(self, test, record):
+        user, system, voluntary, involuntary = cpu_usage()
+        start_user, start_system, start_voluntary, start_involuntary = self.usage
+        runtime = record['stop'] - record['start']
+        cpu = (user - start_user) + (system - start_system)
+        record['cpu_user'] = user - start_user
+        record['cpu_system'] = system - start_system
+        record['cpu_time'] = cpu
+        # Threads of the process can use more CPU than the test's runtime
+        record['wait_time'] = max(runtime - cpu, 0.0)
+        if voluntary is not None:
+            record['voluntary_switches'] = voluntary - start_voluntary
+            record['involuntary_switches'] = involuntary - start_involuntary
+        record['bound'] = 'cpu' if cpu >= self.cpu_bound * runtime else 'wait'
+
+    def write_report(self, stream, bench_dict, class_dict):
+        groups = {}
+        for record in bench_dict.values():
+            if 'bound' not in record:
+                continue
+            group = groups.setdefault(record['bound'], [0, 0.0, 0.0, 0.0])
+            group[0] += 1
+            group[1] += record['stop'] - record['start']
+            group[2] += record['cpu_time']
+            group[3] += record['wait_time']
+        if not groups:
+            return
+        stream.writeln()
+        stream.writeln(tabulate(
+            [
+                {
+                    "Bound": bound,
+                    "Tests": count,
+                    "Runtime": "{:.5f}".format(runtime),
+                    "CPU": "{:.5f}".format(cpu),
+                    "Wait": "{:.5f}".format(wait),
+                }
+                for bound, (count, runtime, cpu, wait) in sorted(groups.items())
+            ],
+            headers="keys",
+            aligns=('left', 'right', 'right', 'right', 'right')
+        ))
@@ -0,0 +1,172 @@
+from contextlib import contextmanager
+from functools import wraps
+
+from django.core.management.commands import migrate
+from django.db import connections
+
+from .clock import clock
+from .tabulate import tabulate
+
+
+def step_label(name, kwargs):
+    # Clones and their teardown are told apart by their suffix
+    suffix = kwargs.get('suffix', kwargs.get('number'))
+    if suffix is None:
+        return name
+    return "{} {}".format(name, suffix)
+
+
+class DatabaseTimer(object):
+    """
+    Times setting up and tearing down the test databases.
+
+    Each step run through a connection's creation (creating, cloning,
+    serializing and destroying a test database) is recorded against its
+    alias, along with every migration applied while it is created.
+    Both are kept as (label, start, stop) in `spans` too.
+    """
+
+    setup_methods = (
+        ('create_test_db', 'create'),
+        ('clone_test_db', 'clone'),
+        ('serialize_db_to_string', 'serialize'),
+    )
+    teardown_methods = (
+        ('destroy_test_db', 'destroy'),
+    )
+
+    def __init__(self, keepdb=False, parallel=0):
+        self.keepdb = keepdb
+        self.parallel = parallel
+        self.setup = self.teardown = None
+        self.steps = []
+        self.migrations = []
+        self.spans = []
+        self.alias = None
+        self.migration_start = None
+
+    def timed(self, alias, method, name):
+        timer = self
+
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            timer.alias = alias
+            start = clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                stop = clock()
+                label = step_label(name, kwargs)
+                timer.steps.append((alias, label, stop - start))
+                timer.spans.append(
+                    ("{} {}".format(alias, label), start, stop)
+                )
+
+        return wrapper
+
+    def migration_progress(self, action, migration):
+        if action in ('apply_start', 'unapply_start'):
+            self.migration_start = clock()
+        elif action in ('apply_success', 'unapply_success'):
+            stop = clock()
+            label = "{}.{}".format(migration.app_label, migration.name)
+            self.migrations.append(
+                (self.alias, label, stop - self.migration_start)
+            )
+            self.spans.append((label, self.migration_start, stop))
+
+    @contextmanager
+    def timing(self, phase, methods):
+        timer = self
+        original_callback = migrate.Command.migration_progress_callback
+
+        def migration_progress_callback(command, action, migration=None,
+                                        fake=False):
+            timer.migration_progress(action, migration)
+            return original_callback(command, action, migration, fake)
+
+        patched = []
+        for alias in connections:
+            creation = connections[alias].creation
+            for method, name in methods:
+                patched.append(
+                    (creation, method, creation.__dict__.get(method))
+                )
+                setattr(creation, method, self.timed(
+                    alias, getattr(creation, method), name
+                ))
+        migrate.Command.migration_progress_callback = migration_progress_callback
+
+        start = clock()
+        try:
+            yield
+        finally:
+            setattr(self, phase, clock() - start)
+            migrate.Command.migration_progress_callback = original_callback
+            for creation, method, original in reversed(patched):
+                if original is None:
+                    delattr(creation, method)
+                else:
+                    setattr(creation, method, original)
+
+    def setting_up(self):
+        return self.timing('setup', self.setup_methods)
+
+    def tearing_down(self):
+        return self.timing('teardown', self.teardown_methods)
+
+    def migration_time(self, alias):
+        return sum(
+            runtime for migration_alias, label, runtime in self.migrations
+            if migration_alias == alias
+        )
+
+    def write_report(self, stream, slowest=10):
+        stream.writeln()
+        stream.writeln(
+            "Database setup {:.5f}s, teardown {:.5f}s "
+            "(keepdb: {}, parallel clones: {})".format(
+                self.setup or 0, self.teardown or 0,
+                'yes' if self.keepdb else 'no',
+                self.parallel if self.parallel > 1 else 'none',
+            )
+        )
+
+        table = []
+        for alias, label, runtime in self.steps:
+            table.append({
+                "Database": alias,
+                "Step": label,
+                "Runtime": runtime,
+            })
+            if label == 'create' and self.migration_time(alias):
+                table.append({
+                    "Database": alias,
+                    "Step": ": migrations",
+                    "Runtime": self.migration_time(alias),
+                })
+        if table:
+            stream.writeln()
+            stream.writeln(tabulate(
+                table, headers="keys", floatfmt=".5f",
+                aligns=('left', 'left', 'right')
+            ))
+
+        migrations = sorted(
+            self.migrations, key=lambda migration: migration[2], reverse=True
+        )[:slowest]
+        if migrations:
+            stream.writeln()
+            stream.writeln(tabulate(
+                [
+                    {
+                        "Slowest migrations": label,
+                        "Database": alias,
+                        "Runtime": runtime,
+                    }
+                    for alias, label, runtime in migrations
+                ],
+                headers="keys",
+                floatfmt=".5f",
+                aligns=('left', 'left', 'right')
+            ))
@@ -0,0 +1,206 @@
+"""
+Machine-readable copies of the benchmark table, as JSON or JUnit XML.
+"""
+from collections import OrderedDict
+from time import time
+from xml.etree import ElementTree
+import json
+
+from .history import git_revision
+
+# Output formats with the file written when none is given
+FORMATS = OrderedDict([
+    ('json', 'bench-report.json'),
+    ('junit', 'bench-report.xml'),
+])
+
+# Record keys that are bookkeeping, or already in the report in their
+# own right, rather than data of the test or class.  Stack samples are
+# left to the --bench-sample file.
+INTERNAL_KEYS = frozenset((
+    'test_name', 'class_name', 'module', 'start', 'stop', 'runtime',
+    'spans', 'samples', 'setup', 'setup_start', 'setup_test_data',
+    'fixtures', 'teardown', 'teardown_start', 'flush_time',
+    'deserialize_time', 'fixture_time',
+))
+
+
+def record_data(record, exclude=()):
+    """The keys of a record that aren't internal or in `exclude`."""
+    return OrderedDict(
+        (key, value) for key, value in record.items()
+        if key not in INTERNAL_KEYS and key not in exclude
+    )
+
+
+def test_outcomes(result):
+    """(outcome, detail) by test id for every test that didn't pass."""
+    outcomes = {}
+    entries = [
+        ('error', result.errors),
+        ('failure', result.failures),
+        ('skipped', result.skipped),
+        ('expected_failure', result.expectedFailures),
+        ('unexpected_success', [
+            (test, '') for test in result.unexpectedSuccesses
+        ]),
+    ]
+    for outcome, tests in entries:
+        for test, detail in tests:
+            # Subtests are reported under the test they belong to
+            test = getattr(test, 'test_case', test)
+            if hasattr(test, '_testMethodName'):
+                outcomes.setdefault(
+                    result.parseTest(test)[0], (outcome, detail)
+                )
+    return outcomes
+
+
+def build_report(result):
+    """
+    The data behind the benchmark table of a finished result, with each
+    test, class and module and the metrics of its collectors.  Whatever
+    else the collectors recorded, such as repeated queries or the writes
+    per model, is kept under 'data'.
+    """
+    outcomes = test_outcomes(result)
+    classes = OrderedDict()
+    modules = OrderedDict()
+    for uniq, record in result.bench_dict.items():
+        class_uniq = "{}.{}".format(record['module'], record['class_name'])
+        if class_uniq not in classes:
+            setup = result.class_setup_rows(class_uniq)
+            teardown = result.class_teardown_rows(class_uniq)
+            class_runtime = sum(runtime for label, runtime in setup + teardown)
+            classes[class_uniq] = OrderedDict([
+                ('id', class_uniq),
+                ('module', record['module']),
+                ('class_name', record['class_name']),
+                ('runtime', class_runtime),
+                ('class_setup', OrderedDict(setup)),
+                ('class_teardown', OrderedDict(teardown)),
+                ('metrics', OrderedDict()),
+                ('data', record_data(result.class_dict.get(class_uniq, {}))),
+                ('tests', []),
+            ])
+        test_class = classes[class_uniq]
+
+        outcome, detail = outcomes.get(uniq, ('success', ''))
+        metrics = OrderedDict(
+            (metric.key, record[metric.key])
+            for metric in result.metrics if record.get(metric.key) is not None
+        )
+        test_class['tests'].append(OrderedDict([
+            ('id', uniq),
+            ('test_name', record['test_name']),
+            ('runtime', record['runtime']),
+            ('outcome', outcome),
+            ('detail', detail),
+            ('metrics', metrics),
+            ('data', record_data(record, metrics)),
+        ]))
+        test_class['runtime'] += record['runtime']
+        for metric in result.metrics:
+            if metric.key not in metrics:
+                continue
+            value = metrics[metric.key]
+            if metric.key in test_class['metrics']:
+                value = metric.rollup(test_class['metrics'][metric.key], value)
+            test_class['metrics'][metric.key] = value
+
+    for test_class in classes.values():
+        module = modules.setdefault(test_class['module'], OrderedDict([
+            ('module', test_class['module']),
+            ('runtime', 0.0),
+            ('tests', 0),
+            ('classes', []),
+        ]))
+        module['runtime'] += test_class['runtime']
+        module['tests'] += len(test_class['tests'])
+        module['classes'].append(test_class)
+
+    return OrderedDict([
+        ('timestamp', time()),
+        ('revision', git_revision()),
+        ('runtime', sum(module['runtime'] for module in modules.values())),
+        ('tests', len(result.bench_dict)),
+        ('modules', list(modules.values())),
+    ])
+
+
+def write_json(path, report):
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+
+def write_junit(path, report):
+    """
+    Writes one testsuite per test class.  Class-level setup and teardown
+    and the metrics and data of each test go in properties, with lists
+    and dicts as JSON.
+    """
+    testsuites = ElementTree.Element('testsuites', {
+        'tests': str(report['tests']),
+        'time': "{:.6f}".format(report['runtime']),
+    })
+    for module in report['modules']:
+        for test_class in module['classes']:
+            counts = dict.fromkeys(('failure', 'error', 'skipped'), 0)
+            for test in test_class['tests']:
+                if test['outcome'] in counts:
+                    counts[test['outcome']] += 1
+            testsuite = ElementTree.SubElement(testsuites, 'testsuite', {
+                'name': test_class['id'],
+                'tests': str(len(test_class['tests'])),
+                'failures': str(counts['failure']),
+                'errors': str(counts['error']),
+                'skipped': str(counts['skipped']),
+                'time': "{:.6f}".format(test_class['runtime']),
+            })
+            class_rows = (list(test_class['class_setup'].items()) +
+                          list(test_class['class_teardown'].items()))
+            add_properties(
+                testsuite, class_rows + list(test_class['data'].items())
+            )
+            for test in test_class['tests']:
+                testcase = ElementTree.SubElement(testsuite, 'testcase', {
+                    'classname': test_class['id'],
+                    'name': test['test_name'],
+                    'time': "{:.6f}".format(test['runtime']),
+                })
+                if test['outcome'] in counts:
+                    # Tracebacks end with the exception, reasons are one line
+                    lines = test['detail'].strip().splitlines() or ['']
+                    element = ElementTree.SubElement(
+                        testcase, test['outcome'], {'message': lines[-1]}
+                    )
+                    element.text = test['detail']
+                add_properties(
+                    testcase,
+                    list(test['metrics'].items()) + list(test['data'].items())
+                )
+    ElementTree.ElementTree(testsuites).write(
+        path, encoding='utf-8', xml_declaration=True
+    )
+
+
+def add_properties(element, items):
+    items = list(items)
+    if not items:
+        return
+    properties = ElementTree.SubElement(element, 'properties')
+    for name, value in items:
+        if isinstance(value, (list, tuple, dict)):
+            value = json.dumps(value)
+        ElementTree.SubElement(properties, 'property', {
+            'name': name, 'value': str(value),
+        })
+
+
+def write_output(output_format, path, result):
+    path = path or FORMATS[output_format]
+    report = build_report(result)
+    if output_format == 'junit':
+        write_junit(path, report)
+    else:
+        write_json(path, report)
@@ -0,0 +1,81 @@
+"""
+On-disk history of benchmarked runs, used to spot tests that got slower.
+"""
+from time import time
+import sqlite3
+import subprocess
+
+from .timings import median
+
+
+def git_revision():
+    try:
+        output = subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], stderr=subprocess.STDOUT
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+    return output.decode('ascii').strip()
+
+
+class BenchHistory(object):
+    """
+    SQLite store with one row per test per benchmarked run.
+
+    A test counts as a regression when it is `factor` times slower than
+    the median of its last `window` runs, and at least `min_delta` seconds
+    slower so that very fast tests don't flap.
+    """
+
+    window = 10
+    min_runs = 3
+    min_delta = 0.05
+
+    def __init__(self, path, factor=1.5):
+        self.path = path
+        self.factor = factor
+        self.revision = git_revision()
+        self.db = sqlite3.connect(path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS bench_runs ("
+            "test_id TEXT NOT NULL, revision TEXT NOT NULL, "
+            "timestamp REAL NOT NULL, runtime REAL NOT NULL)"
+        )
+        self.db.execute(
+            "CREATE INDEX IF NOT EXISTS bench_runs_test "
+            "ON bench_runs (test_id, timestamp)"
+        )
+
+    def baseline(self, test_id):
+        rows = self.db.execute(
+            "SELECT runtime FROM bench_runs WHERE test_id = ? "
+            "ORDER BY timestamp DESC LIMIT ?",
+            (test_id, self.window)
+        ).fetchall()
+        if len(rows) < self.min_runs:
+            return None
+        return median(row[0] for row in rows)
+
+    def find_regressions(self, bench_dict):
+        """Returns (test id, runtime, baseline) for each slowed test."""
+        regressions = []
+        for uniq, runtimes in bench_dict.items():
+            baseline = self.baseline(uniq)
+            if baseline is None:
+                continue
+            runtime = runtimes['runtime']
+            if (runtime > baseline * self.factor and
+                    runtime - baseline >= self.min_delta):
+                regressions.append((uniq, runtime, baseline))
+        return regressions
+
+    def record(self, bench_dict):
+        timestamp = time()
+        with self.db:
+            self.db.executemany(
+                "INSERT INTO bench_runs VALUES (?, ?, ?, ?)",
+                [
+                    (uniq, self.revision, timestamp, runtimes['runtime'])
+                    for uniq, runtimes in bench_dict.items()
+                ]
+            )
@@ -0,0 +1,103 @@
+import builtins
+import sys
+from importlib.util import resolve_name
+
+from .clock import clock
+from .tabulate import tabulate
+
+
+def absolute_name(name, globals, level):
+    if not level:
+        return name
+    package = (globals or {}).get('__package__') or ''
+    try:
+        return resolve_name('.' * level + name, package)
+    except (ImportError, ValueError):
+        return name
+
+
+class ImportTimer(object):
+    """
+    Times the imports made while active by replacing __import__.
+
+    Only import statements that actually load new modules are recorded.
+    `inclusive` holds the time of each such import with everything it
+    pulled in, `exclusive` the time left after its nested imports.
+    """
+
+    def __init__(self):
+        self.inclusive = {}
+        self.exclusive = {}
+        self.stack = []
+        self.original_import = None
+        self.build_time = None
+
+    def __call__(self, name, globals=None, locals=None, fromlist=(), level=0):
+        loaded = len(sys.modules)
+        self.stack.append(0.0)
+        start = clock()
+        try:
+            return self.original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = clock() - start
+            nested = self.stack.pop()
+            if self.stack:
+                self.stack[-1] += elapsed
+            if len(sys.modules) != loaded:
+                name = absolute_name(name, globals, level)
+                self.inclusive[name] = self.inclusive.get(name, 0) + elapsed
+                self.exclusive[name] = (
+                    self.exclusive.get(name, 0) + elapsed - nested
+                )
+
+    def __enter__(self):
+        self.original_import = builtins.__import__
+        builtins.__import__ = self
+        self.start = clock()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.build_time = clock() - self.start
+        builtins.__import__ = self.original_import
+
+    def write_report(self, stream, test_modules, slowest=10):
+        stream.writeln()
+        stream.writeln("Suite built in {:.5f}s".format(self.build_time))
+
+        modules = sorted(
+            ((self.inclusive[module], module)
+             for module in test_modules if module in self.inclusive),
+            reverse=True
+        )
+        if modules:
+            stream.writeln()
+            stream.writeln(tabulate(
+                [
+                    {"Test module": module, "Import": runtime}
+                    for runtime, module in modules
+                ],
+                headers="keys",
+                floatfmt=".5f",
+                aligns=('left', 'right')
+            ))
+
+        imports = sorted(
+            ((self.exclusive[module], module)
+             for module in self.exclusive if module not in test_modules),
+            reverse=True
+        )[:slowest]
+        if imports:
+            stream.writeln()
+            stream.writeln(tabulate(
+                [
+                    {
+                        "Slowest imports": module,
+                        "Self": runtime,
+                        "Total": self.inclusive[module],
+                    }
+                    for runtime, module in imports
+                ],
+                headers="keys",
+                floatfmt=".5f",
+                aligns=('left', 'right', 'right')
+            ))
@@ -0,0 +1,94 @@
+import os
+import tracemalloc
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+from .collectors import Collector, Metric
+from .sampling import short_path
+
+MB = 1024.0 * 1024.0
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def current_rss():
+    """Resident set size of this process in bytes, or None if unknown."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (IOError, OSError, ValueError):
+        pass
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    return None
+
+
+class MemoryCollector(Collector):
+    """
+    Records each test's peak traced allocation and how much the process
+    RSS grew while it ran.
+
+    Traces are cleared at the start of each test, so for tests peaking
+    at `threshold` MB or more, the `top` source lines holding the most
+    memory still allocated by the test when it finished are listed too.
+    RSS needs /proc or psutil.
+    """
+
+    metrics = (
+        Metric('Peak MB', 'peak_memory', '{:.2f}', rollup=max),
+        Metric('RSS +MB', 'rss_growth', '{:+.2f}'),
+    )
+
+    def __init__(self, threshold=10, top=3):
+        self.threshold = threshold
+        self.top = top
+        self.rss = None
+        self.started = False
+
+    def start_test(self, test, record):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started = True
+        tracemalloc.clear_traces()
+        self.rss = current_rss()
+
+    def stop_test(self, test, record):
+        rss = current_rss()
+        if rss is not None and self.rss is not None:
+            record['rss_growth'] = (rss - self.rss) / MB
+        peak = tracemalloc.get_traced_memory()[1] / MB
+        record['peak_memory'] = peak
+        if peak < self.threshold:
+            return
+
+        # Filtering the grouped statistics is far cheaper than the traces
+        statistics = [
+            stat for stat in
+            tracemalloc.take_snapshot().statistics('lineno')
+            if not stat.traceback[0].filename.startswith(PACKAGE_DIR)
+            and stat.traceback[0].filename != tracemalloc.__file__
+        ]
+        record['allocations'] = [
+            (
+                "{}:{}".format(
+                    short_path(stat.traceback[0].filename),
+                    stat.traceback[0].lineno
+                ),
+                stat.size / MB,
+            )
+            for stat in statistics[:self.top]
+        ]
+
+    def report_rows(self, record):
+        return [
+            {"Test": label, "Peak MB": "{:.2f}".format(size)}
+            for label, size in record.get('allocations', ())
+        ]
+
+    def write_report(self, stream, bench_dict, class_dict):
+        # Tracing slows every allocation, don't leave it on after the run
+        if self.started:
+            tracemalloc.stop()
+            self.started = False
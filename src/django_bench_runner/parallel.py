@@ -0,0 +1,59 @@
+from functools import partial
+
+from django.test import runner as django_runner
+from django.test.runner import (
+    ParallelTestSuite, RemoteTestResult, RemoteTestRunner
+)
+
+from .collectors import RecordingMixin
+
+
+class BenchRemoteTestResult(RecordingMixin, RemoteTestResult):
+    """
+    Records timings inside a parallel worker.
+
+    Each test's record is sent back to the parent process as an
+    `addBench` event, tagged with the id of the worker that ran it.
+    """
+
+    def new_record(self, test):
+        record = super(BenchRemoteTestResult, self).new_record(test)
+        record['worker'] = getattr(django_runner, '_worker_id', 0)
+        return record
+
+    def addClassBench(self, test, record):
+        if self.benchmark:
+            record['worker'] = getattr(django_runner, '_worker_id', 0)
+            super(BenchRemoteTestResult, self).addClassBench(test, record)
+            # test_index is still -1 when the first class is set up
+            uniq = "{}.{}".format(record['module'], record['class_name'])
+            self.events.append(
+                ('addRemoteClassBench', self.test_index, uniq, record)
+            )
+        self.class_dict.clear()
+
+    def stopTest(self, test):
+        record = super(BenchRemoteTestResult, self).stopTest(test)
+        if self.benchmark:
+            self.events.append(('addBench', self.test_index, record))
+        # Nothing reads the records here once they are sent
+        self.bench_dict.clear()
+        return record
+
+
+class BenchRemoteTestRunner(RemoteTestRunner):
+    """RemoteTestRunner that records benchmarks in the worker."""
+
+    def __init__(self, *args, **kwargs):
+        benchmark = kwargs.pop('benchmark', False)
+        collectors = kwargs.pop('collectors', ())
+        stream = kwargs.pop('stream', None)
+        repeat = kwargs.pop('repeat', False)
+        super(BenchRemoteTestRunner, self).__init__(*args, **kwargs)
+        self.resultclass = partial(
+            BenchRemoteTestResult,
+            benchmark=benchmark,
+            collectors=collectors,
+            stream=stream,
+            repeat=repeat,
+        )
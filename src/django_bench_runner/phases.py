@@ -0,0 +1,72 @@
+from functools import wraps
+import inspect
+
+from .clock import clock
+from .collectors import Collector, Metric
+
+# Keeps the wrapper frames out of failing tests' tracebacks, as unittest
+# does for its own helpers
+__unittest = True
+
+_missing = object()
+
+
+def timed(method, record, key):
+    """
+    Wraps method so the time spent in it is added to record[key], and
+    each call is kept as a (key, start, stop) span in record['spans'].
+    """
+
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        start = clock()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            stop = clock()
+            record[key] += stop - start
+            record.setdefault('spans', []).append((key, start, stop))
+
+    return wrapper
+
+
+class PhaseCollector(Collector):
+    """
+    Splits each test's runtime into setUp, the test method and tearDown.
+
+    The three methods are shadowed on the test instance with timed
+    wrappers while the test runs, and restored afterwards.
+    """
+
+    metrics = (
+        Metric('setUp', 'setup'),
+        Metric('Body', 'body'),
+        Metric('tearDown', 'teardown'),
+    )
+
+    def __init__(self):
+        self.saved = {}
+
+    def start_test(self, test, record):
+        phases = (
+            ('setUp', 'setup'),
+            (test._testMethodName, 'body'),
+            ('tearDown', 'teardown'),
+        )
+        self.saved = {}
+        for name, key in phases:
+            record[key] = 0.0
+            method = getattr(test, name, None)
+            # Coroutines are awaited by the test case, not called
+            if method is None or inspect.iscoroutinefunction(method):
+                continue
+            self.saved[name] = test.__dict__.get(name, _missing)
+            setattr(test, name, timed(method, record, key))
+
+    def stop_test(self, test, record):
+        for name, original in self.saved.items():
+            if original is _missing:
+                del test.__dict__[name]
+            else:
+                test.__dict__[name] = original
+        self.saved = {}
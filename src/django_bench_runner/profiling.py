@@ -0,0 +1,82 @@
+import cProfile
+import os
+import pstats
+
+from .collectors import Collector
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def function_label(func):
+    filename, lineno, name = func
+    if filename == '~':
+        # Builtins have no file, their name says it all
+        return name
+    return "{}:{}({})".format(os.path.basename(filename), lineno, name)
+
+
+class ProfileCollector(Collector):
+    """
+    Runs every test under cProfile and keeps the profile of each test
+    that takes at least `threshold` seconds.
+
+    Profiles are saved to `directory` as <module.Class.test>.prof, and the
+    `top` functions with the most time of their own are listed under the
+    test in the report.
+    """
+
+    def __init__(self, directory, threshold=0.5, top=5):
+        self.directory = directory
+        self.threshold = threshold
+        self.top = top
+        self.profile = None
+
+    def start_test(self, test, record):
+        self.profile = cProfile.Profile()
+        try:
+            self.profile.enable()
+        except ValueError:
+            # Another profiler, such as coverage, is already running
+            self.profile = None
+
+    def stop_test(self, test, record):
+        if self.profile is not None:
+            self.profile.disable()
+
+    def finish_test(self, test, record):
+        # Building the stats is slow, so it waits until the sampler and
+        # tracemalloc have stopped counting for the test
+        profile, self.profile = self.profile, None
+        if profile is None:
+            return
+        if record['stop'] - record['start'] < self.threshold:
+            return
+
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        path = os.path.join(
+            self.directory, "{}.{}.{}.prof".format(
+                record['module'], record['class_name'], record['test_name']
+            )
+        )
+        stats = pstats.Stats(profile)
+        stats.dump_stats(path)
+        record['profile'] = path
+
+        # The runner's own bookkeeping is profiled too, leave it out
+        hotspots = sorted(
+            (item for item in stats.stats.items()
+             if not item[0][0].startswith(PACKAGE_DIR)),
+            key=lambda item: item[1][2], reverse=True
+        )[:self.top]
+        record['hotspots'] = [
+            (function_label(func), own_time)
+            for func, (calls, primitive, own_time, cumulative, callers)
+            in hotspots
+        ]
+
+    def report_rows(self, record):
+        return [
+            {"Test": label, "Runtime": "{:.5f}".format(own_time)}
+            for label, own_time in record.get('hotspots', ())
+        ]
@@ -0,0 +1,157 @@
+import os
+import re
+import sys
+
+import django
+from django.db import connections
+
+from .clock import clock
+from .collectors import Collector, Metric
+from .sampling import short_path
+from .tabulate import tabulate
+
+DJANGO_DIR = os.path.dirname(os.path.abspath(django.__file__))
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+PLACEHOLDER_LISTS = re.compile(r"\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)")
+WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(sql):
+    """SQL with its literals and the length of IN lists taken out."""
+    sql = LITERALS.sub('?', sql)
+    sql = PLACEHOLDER_LISTS.sub('(...)', sql.replace('%s', '?'))
+    return WHITESPACE.sub(' ', sql).strip()
+
+
+def call_site():
+    """file:line of the innermost frame outside Django and this package."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if not (filename.startswith(DJANGO_DIR) or
+                filename.startswith(PACKAGE_DIR)):
+            return "{}:{}".format(short_path(filename), frame.f_lineno)
+        frame = frame.f_back
+    return '<unknown>'
+
+
+def shorten(sql, width=60):
+    if len(sql) <= width:
+        return sql
+    return sql[:width - 3] + '...'
+
+
+class QueryCollector(Collector):
+    """
+    Counts and times the SQL run by each test.
+
+    Installs itself as an execute wrapper on every configured connection
+    while a test runs, so it works without DEBUG and without keeping
+    connection.queries around.
+
+    With `repeat_threshold` set, statements are also counted by their
+    fingerprint, and any run more than that many times in one test are
+    kept with the call site of their first run, which usually points at
+    a missing select_related or prefetch_related.
+    """
+
+    metrics = (
+        Metric('Queries', 'queries', '{:d}'),
+        Metric('Query time', 'query_time'),
+        Metric('Slowest query', 'slowest_query', rollup=max),
+    )
+
+    def __init__(self, repeat_threshold=None, top=10):
+        self.repeat_threshold = repeat_threshold
+        self.top = top
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.total = 0.0
+        self.slowest = 0.0
+        # fingerprint -> [runs, call site of the first run]
+        self.fingerprints = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.repeat_threshold is not None:
+            key = fingerprint(sql)
+            if key in self.fingerprints:
+                self.fingerprints[key][0] += 1
+            else:
+                self.fingerprints[key] = [1, call_site()]
+        start = clock()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = clock() - start
+            self.count += 1
+            self.total += elapsed
+            if elapsed > self.slowest:
+                self.slowest = elapsed
+
+    def start_test(self, test, record):
+        self.reset()
+        for connection in connections.all():
+            connection.execute_wrappers.append(self)
+
+    def stop_test(self, test, record):
+        for connection in connections.all():
+            if self in connection.execute_wrappers:
+                connection.execute_wrappers.remove(self)
+        record['queries'] = self.count
+        record['query_time'] = self.total
+        record['slowest_query'] = self.slowest
+        if self.repeat_threshold is None:
+            return
+        repeated = [
+            [sql, runs, site]
+            for sql, (runs, site) in self.fingerprints.items()
+            if runs > self.repeat_threshold
+        ]
+        if repeated:
+            record['repeated_queries'] = sorted(
+                repeated, key=lambda query: query[1], reverse=True
+            )
+
+    def report_rows(self, record):
+        return [
+            {
+                "Test": "{} {}".format(site, shorten(sql)),
+                "Queries": "{:d}".format(runs),
+            }
+            for sql, runs, site in record.get('repeated_queries', ())
+        ]
+
+    def write_report(self, stream, bench_dict, class_dict):
+        repeated = [
+            (uniq, sql, runs, site)
+            for uniq, record in bench_dict.items()
+            for sql, runs, site in record.get('repeated_queries', ())
+        ]
+        if not repeated:
+            return
+        repeated.sort(key=lambda query: query[2], reverse=True)
+        stream.writeln()
+        stream.writeln(
+            "{} tests run the same query more than {} times".format(
+                len(set(query[0] for query in repeated)),
+                self.repeat_threshold,
+            )
+        )
+        stream.writeln()
+        stream.writeln(tabulate(
+            [
+                {
+                    "Repeated queries": uniq,
+                    "Runs": runs,
+                    "Call site": site,
+                    "SQL": shorten(sql),
+                }
+                for uniq, sql, runs, site in repeated[:self.top]
+            ],
+            headers="keys",
+            aligns=('left', 'right', 'left', 'left')
+        ))
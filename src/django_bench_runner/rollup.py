@@ -0,0 +1,74 @@
+"""
+Totals of a run per app, package, module and class.
+"""
+from collections import OrderedDict
+
+from django.apps import apps
+
+from .table import Table
+
+
+def app_name(module):
+    """Label of the app holding module, or its top-level package."""
+    config = apps.get_containing_app_config(module)
+    if config is not None:
+        return config.label
+    return module.split('.')[0]
+
+
+def package_name(module):
+    return module.rpartition('.')[0] or module
+
+
+class Rollup(object):
+    """
+    Adds up the tests and runtime of each class, class-level setup and
+    teardown included, into every level above it.
+    """
+
+    levels = (
+        ('App', app_name),
+        ('Package', package_name),
+        ('Module', lambda module: module),
+    )
+
+    def __init__(self):
+        self.totals = OrderedDict(
+            (header, OrderedDict()) for header, name in self.levels
+        )
+        self.totals['Class'] = OrderedDict()
+
+    def add(self, module, class_uniq, tests, runtime):
+        names = [(header, name(module)) for header, name in self.levels]
+        names.append(('Class', class_uniq))
+        for header, name in names:
+            total = self.totals[header].setdefault(name, [0, 0.0])
+            total[0] += tests
+            total[1] += runtime
+
+    def write_report(self, stream, total_run_time, top=None):
+        """Writes a table per level, slowest first, `top` rows at most."""
+        for header, totals in self.totals.items():
+            rows = sorted(
+                totals.items(), key=lambda item: item[1][1], reverse=True
+            )
+            table = Table(
+                [header, "Tests", "Runtime", "Mean", "Percent"],
+                ('left', 'right', 'right', 'right', 'right')
+            )
+            table.extend(
+                {
+                    header: name,
+                    "Tests": "{:d}".format(tests),
+                    "Runtime": "{:.5f}".format(runtime),
+                    "Mean": "{:.5f}".format(runtime / tests),
+                    "Percent": "{:>7.2f}%".format(
+                        runtime / total_run_time * 100
+                    ),
+                }
+                for name, (tests, runtime) in rows[:top]
+            )
+            if top and len(rows) > top:
+                table.add({header: "({} more)".format(len(rows) - top)})
+            stream.writeln()
+            table.write(stream)
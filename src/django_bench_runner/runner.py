@@ -1,13 +1,40 @@
+from contextlib import contextmanager
 from collections import OrderedDict
-from time import time
+from functools import partial
+import argparse
+import copy
+import sys
 import unittest
 
-try:
-    from django.test.runner import DiscoverRunner
-except ImportError:
-    raise("Django 1.8 or 1.9 needs to be installed to use this test runner.")
-
+from django.test.runner import DiscoverRunner
+
+from .budgets import Budgets
+from .client import RequestCollector
+from .collectors import Metric, RecordingMixin
+from .cpu import CpuCollector
+from .databases import DatabaseTimer
+from .exports import FORMATS, write_output
+from .history import BenchHistory
+from .imports import ImportTimer
+from .memory import MemoryCollector
+from .parallel import BenchRemoteTestRunner, ParallelTestSuite
+from .phases import PhaseCollector
+from .profiling import ProfileCollector
+from .queries import QueryCollector
+from .rollup import Rollup
+from .sampling import SamplingProfiler
+from .snapshots import DatabaseSnapshots
+from .stream import RecordStream
+from .suite import BenchTestSuite
+from .table import Table
 from .tabulate import tabulate
+from .timings import (
+    load_timings, partition_by_timing, run_stats, save_timings,
+    shard_tests, shard_timings_path
+)
+from .trace import Trace
+from .transactions import TransactionCollector
+from .writes import WriteCollector
 
 class Bcolors:
     MAGENTA = '\033[95m'
@@ -26,6 +53,17 @@ class Bcolors:
         self.FAIL = ''
         self.ENDC = ''
 
+# Classes run whole in one worker, so the totals keep the first value.
+WORKER_METRIC = Metric('Worker', 'worker', '{:d}', rollup=lambda total, value: total)
+
+# Shown for repeated tests, whose runtime is the median of their runs.
+REPEAT_METRICS = [
+    Metric('Min', 'min'),
+    Metric('P95', 'p95'),
+    Metric('Stddev', 'stddev', rollup=max),
+    Metric('CV', 'cv', '{:.1%}', rollup=max),
+]
+
 def get_color(runtime, longest_test):
     """
     Returns color based on test time.
@@ -44,14 +82,72 @@ def get_color(runtime, longest_test):
         return Bcolors.MAGENTA
     return Bcolors.RED
 
-class BenchTextTestResult(unittest.TextTestResult):
+def iter_tests(suite):
+    """Yields the test cases of a suite, however deeply nested."""
+    for test in suite:
+        if isinstance(test, unittest.TestSuite):
+            for nested in iter_tests(test):
+                yield nested
+        else:
+            yield test
+
+def parse_shard(value):
+    """Parses INDEX/TOTAL, as in --shard 2/8, into (index, total)."""
+    try:
+        index, total = [int(part) for part in value.split('/')]
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            "expected INDEX/TOTAL, got {!r}".format(value)
+        )
+    if not 1 <= index <= total:
+        raise argparse.ArgumentTypeError(
+            "shard {} does not exist, shards count from 1 to {}".format(
+                index, total
+            )
+        )
+    return index, total
+
+def repeat_tests(suite, times):
+    """
+    A suite of the same type running each test of suite `times` times in
+    a row, each run on a fresh instance of its test case.
+
+    Instances are copied rather than rebuilt, since test cases such as
+    unittest's stand-ins for modules that failed to import take more
+    than a method name.  Nothing has run yet, so the copies are as fresh
+    as new instances.
+    """
+    tests = []
+    for test in iter_tests(suite):
+        tests.append(test)
+        if isinstance(test, unittest.TestCase):
+            tests.extend(copy.copy(test) for _ in range(times - 1))
+    return type(suite)(tests)
+
+class BenchTextTestResult(RecordingMixin, unittest.TextTestResult):
     """Overrides TextTestRunner to add benchmartk tool"""
 
+    # Repeated tests varying more than this between runs are unstable, if
+    # their runs are also this many seconds apart, so fast tests don't flap
+    unstable_cv = 0.1
+    unstable_stddev = 0.005
+
     def __init__(self, *args, **kwargs):
 
-        self.benchmark = kwargs.pop('benchmark')
+        self.history = kwargs.pop('history', None)
+        self.top = kwargs.pop('top', None)
+        self.rollup = Rollup() if kwargs.pop('rollup', False) else None
+        self.budgets = kwargs.pop('budgets', None)
+        self.soft_budgets = kwargs.pop('soft_budgets', False)
         super(BenchTextTestResult, self).__init__(*args, **kwargs)
-        self.bench_dict = OrderedDict()
+        self.regressions = []
+        self.over_budget = []
+        self.class_runtimes = {}
+        self.metrics = [
+            metric
+            for collector in self.collectors
+            for metric in collector.metrics
+        ]
 
 
     def startTestRun(self):
@@ -60,106 +156,354 @@ class BenchTextTestResult(unittest.TextTestResult):
 
     def write_totals(self, table, class_name, totals):
 
-        table.append({
+        divider = {
             "Test": "---------------------------",
             "Runtime": "-------",
             "Percent": "-------",
-        })
-        table.append({
-            "Test": "{}{}{}".format(Bcolors.TURQ, class_name, Bcolors.END),
-            "Runtime": "{0}{1:.5f}{2}".format(
-                Bcolors.TURQ, totals['runtime'], Bcolors.END
-            ),
-            "Percent": "{}{:>7.2f}%{}".format(
-                Bcolors.TURQ, totals['percent'], Bcolors.END)
-        })
-
-
+        }
+        for metric in self.metrics:
+            divider[metric.header] = "-------"
+        table.append(divider)
+
+        row = {
+            "Test": (class_name, Bcolors.TURQ),
+            "Runtime": ("{:.5f}".format(totals['runtime']), Bcolors.TURQ),
+            "Percent": ("{:>7.2f}%".format(totals['percent']), Bcolors.TURQ),
+        }
+        for metric in self.metrics:
+            row[metric.header] = (
+                metric.format(totals.get(metric.key)), Bcolors.TURQ
+            )
+        table.append(row)
+
+    def add_to_totals(self, totals, runtimes):
+        for metric in self.metrics:
+            value = runtimes.get(metric.key)
+            if value is None:
+                continue
+            if metric.key in totals:
+                value = metric.rollup(totals[metric.key], value)
+            totals[metric.key] = value
+
+
+
+    def class_setup_rows(self, class_uniq):
+        """
+        (label, runtime) pairs for the class-level setup of a class.
+        setUpClass is shown without the fixtures and setUpTestData in it.
+        """
+        record = self.class_dict.get(class_uniq, {})
+        if 'setup' not in record:
+            return []
+        fixtures = list(record['fixtures'].items())
+        setup = record['setup'] - record['setup_test_data'] - sum(
+            runtime for label, runtime in fixtures
+        )
+        rows = [('setUpClass', setup)]
+        rows.extend(('fixture ' + label, runtime) for label, runtime in fixtures)
+        if record['setup_test_data']:
+            rows.append(('setUpTestData', record['setup_test_data']))
+        return rows
+
+    def class_teardown_rows(self, class_uniq):
+        """
+        (label, runtime) pairs for the class-level teardown of a class,
+        with the database resets between its tests when they were timed.
+        """
+        return self.teardown_rows(self.class_dict.get(class_uniq, {}))
+
+    def teardown_rows(self, record):
+        if 'teardown' not in record:
+            return []
+        rows = [('tearDownClass', record['teardown'])]
+        for label, key in (
+                ('flush', 'flush_time'),
+                ('deserialize', 'deserialize_time'),
+                ('fixtures per test', 'fixture_time')):
+            if record.get(key):
+                rows.append((label, record[key]))
+        return rows
+
+    def write_class_rows(self, table, rows, totals, total_run_time):
+        for label, runtime in rows:
+            percent = runtime / total_run_time * 100
+            totals['runtime'] += runtime
+            totals['percent'] += percent
+            table.append({
+                "Test": "+ " + label,
+                "Runtime": "{:.5f}".format(runtime),
+                "Percent": "{:>7.2f}%".format(percent)
+            })
 
     def stopTestRun(self):
 
         if not self.benchmark:
             return
 
+        if self.record_stream:
+            self.record_stream.close()
+            self.bench_dict, self.class_dict = self.record_stream.load()
+
         total_run_time = 0
         longest_test = 0
 
         # Loop through tests to get total run time
         for class_name, runtimes in self.bench_dict.items():
             runtimes['runtime'] = runtimes['stop'] - runtimes['start']
+            if 'runs' in runtimes:
+                runtimes.update(run_stats(runtimes['runs']))
+                runtimes['runtime'] = runtimes['median']
+                if REPEAT_METRICS[0] not in self.metrics:
+                    self.metrics.extend(REPEAT_METRICS)
             total_run_time += runtimes['runtime']
             longest_test = max(longest_test, runtimes['runtime'])
 
-        table = list()
-        totals = {'runtime': 0, 'percent': 0}
+        # Class-level setup and teardown are part of the run time too
+        for class_uniq in self.class_dict:
+            rows = (self.class_setup_rows(class_uniq) +
+                    self.class_teardown_rows(class_uniq))
+            total_run_time += sum(runtime for label, runtime in rows)
+
+        if self.history:
+            self.regressions = self.history.find_regressions(self.bench_dict)
+            self.history.record(self.bench_dict)
+
+        classes = OrderedDict()
+        for runtimes in self.bench_dict.values():
+            class_uniq = "{}.{}".format(
+                runtimes['module'], runtimes['class_name']
+            )
+            classes.setdefault(class_uniq, []).append(runtimes)
+
+        class_tables = []
+        for class_uniq, tests in classes.items():
+            rows, totals = self.class_table(
+                class_uniq, tests, total_run_time, longest_test
+            )
+            class_tables.append((totals['runtime'], rows))
+            if self.rollup:
+                self.rollup.add(
+                    tests[0]['module'], class_uniq, len(tests),
+                    totals['runtime']
+                )
+
+        if self.top:
+            hidden = len(class_tables) - self.top
+            class_tables.sort(key=lambda item: item[0], reverse=True)
+            del class_tables[self.top:]
+            if hidden > 0:
+                class_tables.append(
+                    (0, [{}, {"Test": "({} more classes)".format(hidden)}])
+                )
+        table = Table(
+            ["Test", "Runtime", "Percent"] +
+            [metric.header for metric in self.metrics],
+            ('left', 'right', 'right') + ('right',) * len(self.metrics)
+        )
+        for runtime, rows in class_tables:
+            table.extend(rows)
 
-        class_name = ''
-        for full_path, runtimes in self.bench_dict.items():
-            runtime = runtimes['runtime']
-            color = get_color(runtime, longest_test)
+        self.stream.writeln()
+        self.stream.writeln()
+        table.write(self.stream)
 
-            # Write header/divider for new class
-            if class_name != runtimes['class_name']:
+        if self.rollup:
+            self.rollup.write_report(self.stream, total_run_time, self.top)
 
-                if totals['runtime'] > 0:
-                    self.write_totals(table, class_name, totals)
-                    totals = {'runtime': 0, 'percent': 0}
+        if self.regressions:
+            self.write_regressions()
 
-                class_name = runtimes['class_name']
-                module = runtimes['module']
-                table.append({})
-                table.append({"Test": "{}{}.{}{}".format(
-                    Bcolors.BLUE, module, class_name, Bcolors.END
-                )})
+        self.write_unstable()
 
+        if self.over_budget:
+            self.write_over_budget()
 
+        for collector in self.collectors:
+            collector.write_report(
+                self.stream, self.bench_dict, self.class_dict
+            )
 
-            percent = runtime / total_run_time * 100
-            totals['runtime'] += runtime
-            totals['percent'] += percent
-            table.append({
+    def class_table(self, class_uniq, tests, total_run_time, longest_test):
+        """
+        Rows of one class in the table, and its totals.  With `top` set,
+        only that many of its slowest tests are shown, slowest first.
+        """
+        table = [{}, {"Test": (class_uniq, Bcolors.BLUE)}]
+        totals = {'runtime': 0, 'percent': 0}
+        self.write_class_rows(
+            table, self.class_setup_rows(class_uniq), totals, total_run_time
+        )
+
+        shown = tests
+        if self.top:
+            shown = sorted(
+                tests, key=lambda runtimes: runtimes['runtime'], reverse=True
+            )[:self.top]
+        for runtimes in tests:
+            totals['runtime'] += runtimes['runtime']
+            totals['percent'] += runtimes['runtime'] / total_run_time * 100
+            self.add_to_totals(totals, runtimes)
+
+        for runtimes in shown:
+            runtime = runtimes['runtime']
+            row = {
                 "Test": ": " + runtimes['test_name'],
-                "Runtime": "{0}{1:.5f}{2}".format(
-                    color, runtime, Bcolors.END
+                "Runtime": (
+                    "{:.5f}".format(runtime), get_color(runtime, longest_test)
                 ),
-                "Percent": "{:>7.2f}%".format(percent)
+                "Percent": "{:>7.2f}%".format(runtime / total_run_time * 100)
+            }
+            for metric in self.metrics:
+                row[metric.header] = metric.format(runtimes.get(metric.key))
+            table.append(row)
+            for collector in self.collectors:
+                for cells in collector.report_rows(runtimes):
+                    cells["Test"] = "> " + cells["Test"]
+                    table.append(cells)
+        if len(shown) < len(tests):
+            table.append({
+                "Test": "({} more tests)".format(len(tests) - len(shown))
             })
 
-        self.write_totals(table, class_name, totals)
-
-        self.stream.writeln()
+        self.write_class_rows(
+            table, self.class_teardown_rows(class_uniq), totals, total_run_time
+        )
+        self.write_totals(table, tests[0]['class_name'], totals)
+        return table, totals
+
+    def write_regressions(self):
+        table = [
+            {
+                "Slower than baseline": "{}{}{}".format(
+                    Bcolors.RED, uniq, Bcolors.END
+                ),
+                "Runtime": runtime,
+                "Baseline": baseline,
+                "Change": "{:>+7.0f}%".format(
+                    (runtime - baseline) / baseline * 100
+                ),
+            }
+            for uniq, runtime, baseline in self.regressions
+        ]
         self.stream.writeln()
         self.stream.writeln(tabulate(
             table,
             headers="keys",
-            aligns=('left', 'right', 'right')
+            floatfmt=".5f",
+            aligns=('left', 'right', 'right', 'right')
         ))
 
-    def parseTest(self, test):
-        module = test.__module__
-        class_name = test.__class__.__name__
-        test_name = test._testMethodName
-        uniq = "{}.{}.{}".format(module, class_name, test_name)
-        return uniq, module, class_name, test_name
-
-    def startTest(self, test):
-        # Run at start of each test method
-
-        uniq, module, class_name, test_name = self.parseTest(test)
+    def write_over_budget(self):
+        color = Bcolors.YELLOW if self.soft_budgets else Bcolors.RED
+        table = [
+            {
+                "Over budget": "{}{}{}".format(color, label, Bcolors.END),
+                "Runtime": runtime,
+                "Budget": budget,
+                "Over": runtime - budget,
+            }
+            for label, runtime, budget in self.over_budget
+        ]
+        self.stream.writeln()
+        self.stream.writeln(tabulate(
+            table,
+            headers="keys",
+            floatfmt=".5f",
+            aligns=('left', 'right', 'right', 'right')
+        ))
+        if not self.soft_budgets:
+            self.stream.writeln("{}{} over budget, failing the run{}".format(
+                Bcolors.RED, len(self.over_budget), Bcolors.END
+            ))
+
+    def check_budget(self, label, runtime, budget):
+        """
+        Records a test or class over its budget.  The test's own outcome
+        has been reported by then, so going over budget fails the run
+        through BenchRunner.suite_result, as regressions do.
+        """
+        if budget is not None and runtime > budget:
+            self.over_budget.append((label, runtime, budget))
+
+    def check_test_budget(self, test, record):
+        runtime = record['stop'] - record['start']
+        class_uniq = "{}.{}".format(record['module'], record['class_name'])
+        self.class_runtimes[class_uniq] = (
+            self.class_runtimes.get(class_uniq, 0) + runtime
+        )
+        self.check_budget(
+            self.parseTest(test)[0], runtime,
+            self.budgets.test_budget(test)
+        )
 
-        self.bench_dict[uniq] = {
-            'start': time(),
-            'test_name': test_name,
-            'class_name': class_name,
-            'module': module,
-        }
-        super(BenchTextTestResult, self).startTest(test)
+    def check_class_budget(self, record):
+        class_uniq = "{}.{}".format(record['module'], record['class_name'])
+        runtime = self.class_runtimes.get(class_uniq, 0)
+        if 'teardown' not in record:
+            self.class_runtimes[class_uniq] = runtime + record['setup']
+            return
+        runtime += sum(
+            seconds for label, seconds in self.teardown_rows(record)
+        )
+        del self.class_runtimes[class_uniq]
+        self.check_budget(
+            class_uniq, runtime,
+            self.budgets.class_budget(record['module'], record['class_name'])
+        )
 
     def stopTest(self, test):
-        uniq, module, class_name, test_name = self.parseTest(test)
+        record = super(BenchTextTestResult, self).stopTest(test)
+        if record is not None and self.budgets:
+            self.check_test_budget(test, record)
+        return record
+
+    def addClassBench(self, test, record, uniq=None):
+        super(BenchTextTestResult, self).addClassBench(test, record, uniq)
+        if self.budgets:
+            self.check_class_budget(record)
+
+    def write_unstable(self):
+        table = [
+            {
+                "Unstable": "{}{}{}".format(Bcolors.YELLOW, uniq, Bcolors.END),
+                "Runs": len(runtimes['runs']),
+                "Median": runtimes['median'],
+                "Stddev": runtimes['stddev'],
+                "CV": "{:.1%}".format(runtimes['cv']),
+            }
+            for uniq, runtimes in self.bench_dict.items()
+            if runtimes.get('cv', 0) > self.unstable_cv and
+            runtimes['stddev'] >= self.unstable_stddev
+        ]
+        if not table:
+            return
+        self.stream.writeln()
+        self.stream.writeln(tabulate(
+            table,
+            headers="keys",
+            floatfmt=".5f",
+            aligns=('left', 'right', 'right', 'right', 'right')
+        ))
 
-        super(BenchTextTestResult, self).stopTest(test)
-        self.bench_dict[uniq]['stop'] = time()
+    def addRemoteClassBench(self, test, uniq, record):
+        """
+        Takes class-level timings from a parallel worker.  `test` is found
+        by an index that can point into another class, so the class is
+        known by its id alone.
+        """
+        self.addClassBench(None, record, uniq)
+
+    def addBench(self, test, record):
+        """Takes the record of a test that ran in a parallel worker."""
+        if WORKER_METRIC not in self.metrics:
+            self.metrics.append(WORKER_METRIC)
+        if self.budgets:
+            self.check_test_budget(test, record)
+        if self.record_stream:
+            # The worker has already written it to the stream
+            return
+        uniq = self.parseTest(test)[0]
+        self.bench_dict[uniq] = record
 
 
 class BenchTextTestRunner(unittest.TextTestRunner):
@@ -170,38 +514,411 @@ class BenchTextTestRunner(unittest.TextTestRunner):
     def __init__(self, *args, **kwargs):
 
         self.benchmark = kwargs.pop('benchmark')
+        self.collectors = kwargs.pop('collectors', ())
+        self.history = kwargs.pop('history', None)
+        self.parallel = kwargs.pop('parallel', False)
+        self.bench_stream = kwargs.pop('bench_stream', None)
+        self.repeat = kwargs.pop('repeat', False)
+        self.top = kwargs.pop('top', None)
+        self.rollup = kwargs.pop('rollup', False)
+        self.budgets = kwargs.pop('budgets', None)
+        self.soft_budgets = kwargs.pop('soft_budgets', False)
         super(BenchTextTestRunner, self).__init__(*args, **kwargs)
 
     def _makeResult(self):
         return self.resultclass(
             self.stream, self.descriptions, self.verbosity,
-            benchmark=self.benchmark
+            benchmark=self.benchmark,
+            collectors=self.collectors,
+            history=self.history,
+            parallel=self.parallel,
+            stream=self.bench_stream,
+            repeat=self.repeat,
+            top=self.top,
+            rollup=self.rollup,
+            budgets=self.budgets,
+            soft_budgets=self.soft_budgets,
         )
 
 
 class BenchRunner(DiscoverRunner):
 
     test_runner = BenchTextTestRunner
+    test_suite = BenchTestSuite
 
     def __init__(self, *args, **kwargs):
 
         super(BenchRunner, self).__init__(*args, **kwargs)
         self.benchmark = kwargs.get('benchmark', False)
+        self.bench_queries = kwargs.get('bench_queries', False)
+        self.bench_repeated_queries = kwargs.get('bench_repeated_queries')
+        self.bench_phases = kwargs.get('bench_phases', False)
+        self.bench_requests = kwargs.get('bench_requests', False)
+        self.bench_transactions = kwargs.get('bench_transactions', False)
+        self.bench_writes = kwargs.get('bench_writes', False)
+        self.bench_bulk_threshold = kwargs.get('bench_bulk_threshold', 20)
+        self.bench_databases = kwargs.get('bench_databases', False)
+        self.database_timer = None
+        self.bench_db_cache = kwargs.get('bench_db_cache')
+        self.bench_imports = kwargs.get('bench_imports', False)
+        self.bench_stream = kwargs.get('bench_stream')
+        self.bench_output = kwargs.get('bench_output')
+        self.bench_output_file = kwargs.get('bench_output_file')
+        self.bench_top = kwargs.get('bench_top')
+        self.bench_rollup = kwargs.get('bench_rollup', False)
+        self.trace = None
+        if self.benchmark and kwargs.get('bench_trace'):
+            self.trace = Trace(kwargs['bench_trace'])
+        self.bench_profile = kwargs.get('bench_profile')
+        self.bench_profile_threshold = kwargs.get(
+            'bench_profile_threshold', 0.5
+        )
+        self.bench_cpu = kwargs.get('bench_cpu', False)
+        self.bench_repeat = kwargs.get('bench_repeat', 1)
+        self.bench_memory = kwargs.get('bench_memory', False)
+        self.bench_memory_threshold = kwargs.get('bench_memory_threshold', 10)
+        self.bench_sample = kwargs.get('bench_sample')
+        self.bench_sample_interval = kwargs.get('bench_sample_interval', 0.005)
+        self.import_timer = None
+        self.test_modules = set()
+        self.snapshots = None
+        self.bench_timings = kwargs.get('bench_timings')
+        self.bench_shard = kwargs.get('bench_shard')
+        self.bench_history = kwargs.get('bench_history')
+        self.bench_regression_factor = kwargs.get('bench_regression_factor', 1.5)
+        self.bench_fail_regressions = kwargs.get('bench_fail_regressions', False)
+        self.bench_soft_budgets = kwargs.get('bench_soft_budgets', False)
 
 
     @classmethod
     def add_arguments(cls, parser):
         super(BenchRunner, cls).add_arguments(parser)
-        parser.add_argument('-b', '--benchmark',
+        parser.add_argument('--benchmark',
             action='store_true', dest='benchmark', default=False,
             help='Record and display a benchark of the run tests.')
-
+        parser.add_argument('--bench-queries',
+            action='store_true', dest='bench_queries', default=False,
+            help='Count and time the SQL queries run by each test.')
+        parser.add_argument('--bench-repeated-queries',
+            type=int, dest='bench_repeated_queries', metavar='N',
+            help='Flag tests running the same query, literals aside, more '
+                 'than N times, with where it was run from. Implies '
+                 '--bench-queries.')
+        parser.add_argument('--bench-phases',
+            action='store_true', dest='bench_phases', default=False,
+            help='Time setUp, the test method and tearDown separately.')
+        parser.add_argument('--bench-requests',
+            action='store_true', dest='bench_requests', default=False,
+            help='Count and time the test client requests of each test and '
+                 'the templates they render.')
+        parser.add_argument('--bench-transactions',
+            action='store_true', dest='bench_transactions', default=False,
+            help='Time the flushes, deserialization and fixture loading '
+                 'between TransactionTestCase tests, and list the classes '
+                 'that could be TestCases.')
+        parser.add_argument('--bench-writes',
+            action='store_true', dest='bench_writes', default=False,
+            help='Count the model instances each test creates, updates and '
+                 'deletes, per model.')
+        parser.add_argument('--bench-bulk-threshold',
+            type=int, dest='bench_bulk_threshold', default=20, metavar='N',
+            help='Suggest bulk_create or bulk_update where a test or class '
+                 'setup saves N or more instances of a model one at a time. '
+                 'Defaults to 20.')
+        parser.add_argument('--bench-databases',
+            action='store_true', dest='bench_databases', default=False,
+            help='Time creating, migrating and destroying the test databases.')
+        parser.add_argument('--bench-imports',
+            action='store_true', dest='bench_imports', default=False,
+            help='Time building the suite and importing each test module.')
+        parser.add_argument('--bench-db-cache',
+            dest='bench_db_cache', metavar='DIR',
+            help='Save migrated SQLite test databases in DIR and restore '
+                 'them instead of migrating while migrations are unchanged.')
+        parser.add_argument('--bench-profile',
+            dest='bench_profile', metavar='DIR',
+            help='Profile each test with cProfile, saving the profiles of '
+                 'slow tests to DIR and listing their hottest functions.')
+        parser.add_argument('--bench-profile-threshold',
+            type=float, dest='bench_profile_threshold', default=0.5,
+            metavar='SECONDS',
+            help='Keep profiles of tests taking at least this long. '
+                 'Defaults to 0.5; use 0 to keep every profile.')
+        parser.add_argument('--bench-repeat',
+            type=int, dest='bench_repeat', default=1, metavar='N',
+            help='Run each test N times, setup included, and report its '
+                 'median, spread and whether it is stable.')
+        parser.add_argument('--bench-rollup',
+            action='store_true', dest='bench_rollup', default=False,
+            help='Add up the tests and runtime of each app, package, '
+                 'module and class after the table.')
+        parser.add_argument('--bench-top',
+            type=int, dest='bench_top', metavar='N',
+            help='Show only the N slowest classes, each with its N slowest '
+                 'tests, and the N slowest entries of each --bench-rollup '
+                 'level.')
+        parser.add_argument('--bench-cpu',
+            action='store_true', dest='bench_cpu', default=False,
+            help='Split each test\'s runtime into CPU time and time spent '
+                 'waiting, and mark tests as CPU-bound or waiting.')
+        parser.add_argument('--bench-memory',
+            action='store_true', dest='bench_memory', default=False,
+            help='Record the peak traced allocation and RSS growth of '
+                 'each test.')
+        parser.add_argument('--bench-memory-threshold',
+            type=float, dest='bench_memory_threshold', default=10,
+            metavar='MB',
+            help='List the top allocation sites of tests peaking at this '
+                 'many MB or more. Defaults to 10.')
+        parser.add_argument('--bench-sample',
+            dest='bench_sample', metavar='FILE',
+            help='Sample the stack of the running test throughout the suite, '
+                 'writing folded stacks for flamegraphs to FILE and listing '
+                 'the hottest functions.')
+        parser.add_argument('--bench-sample-interval',
+            type=float, dest='bench_sample_interval', default=0.005,
+            metavar='SECONDS',
+            help='CPU time between samples. Defaults to 0.005.')
+        parser.add_argument('--bench-timings',
+            dest='bench_timings', metavar='FILE',
+            help='Save per-test runtimes to FILE when benchmarking, and use '
+                 'the runtimes saved there to balance --parallel workers.')
+        parser.add_argument('--shard',
+            type=parse_shard, dest='bench_shard', metavar='INDEX/TOTAL',
+            help='Run only shard INDEX of TOTAL, counting from 1, splitting '
+                 'test classes so every shard takes about the same time '
+                 'by --bench-timings, with or without --benchmark. Timings '
+                 'are then saved per shard, and only count once merged back '
+                 'into --bench-timings with python -m '
+                 'django_bench_runner.timings.')
+        parser.add_argument('--bench-stream',
+            dest='bench_stream', metavar='FILE',
+            help='Write each test\'s benchmark to FILE as line-delimited '
+                 'JSON as soon as it finishes, and build the report from it.')
+        parser.add_argument('--bench-output',
+            choices=list(FORMATS), dest='bench_output',
+            help='Also write the benchmark of every test, class and module '
+                 'with their metrics as json or junit XML.')
+        parser.add_argument('--bench-output-file',
+            dest='bench_output_file', metavar='FILE',
+            help='Where --bench-output writes to. Defaults to '
+                 'bench-report.json or bench-report.xml.')
+        parser.add_argument('--bench-trace',
+            dest='bench_trace', metavar='FILE',
+            help='Write a timeline of the run to FILE in the Chrome '
+                 'trace-event format, with one track per parallel worker.')
+        parser.add_argument('--bench-history',
+            dest='bench_history', metavar='FILE',
+            help='Keep a history of benchmarked runs in the SQLite database '
+                 'FILE and report tests slower than their recent runs.')
+        parser.add_argument('--bench-regression-factor',
+            type=float, dest='bench_regression_factor', default=1.5,
+            help='How many times slower than its baseline a test must be '
+                 'to count as a regression. Defaults to 1.5.')
+        parser.add_argument('--bench-fail-regressions',
+            action='store_true', dest='bench_fail_regressions', default=False,
+            help='Exit with a failure when --bench-history finds regressions.')
+        parser.add_argument('--bench-soft-budgets',
+            action='store_true', dest='bench_soft_budgets', default=False,
+            help='List the tests and classes over their BENCH_BUDGETS or '
+                 '@budget time budget instead of failing them.')
+
+    def get_collectors(self):
+        collectors = []
+        if self.bench_phases:
+            collectors.append(PhaseCollector())
+        if self.bench_queries or self.bench_repeated_queries is not None:
+            collectors.append(QueryCollector(
+                repeat_threshold=self.bench_repeated_queries
+            ))
+        if self.bench_requests:
+            collectors.append(RequestCollector())
+        if self.bench_transactions:
+            collectors.append(TransactionCollector())
+        if self.bench_writes:
+            collectors.append(WriteCollector(
+                bulk_threshold=self.bench_bulk_threshold
+            ))
+        if self.bench_memory:
+            collectors.append(MemoryCollector(
+                threshold=self.bench_memory_threshold
+            ))
+        if self.bench_cpu:
+            collectors.append(CpuCollector())
+        if self.bench_sample:
+            collectors.append(SamplingProfiler(
+                self.bench_sample, interval=self.bench_sample_interval
+            ))
+        # Last, so the profiler sees as little of the others as possible
+        if self.bench_profile:
+            collectors.append(ProfileCollector(
+                self.bench_profile, threshold=self.bench_profile_threshold
+            ))
+        return collectors
+
+    def run_tests(self, *args, **kwargs):
+        result = super(BenchRunner, self).run_tests(*args, **kwargs)
+        if self.benchmark:
+            self.write_report(unittest.runner._WritelnDecorator(sys.stderr))
+        if self.trace:
+            if self.database_timer:
+                self.trace.add_database_timer(self.database_timer)
+            self.trace.write()
+        return result
+
+    @contextmanager
+    def traced(self, name):
+        """Adds the time spent in the block to the trace, if any."""
+        if not self.trace:
+            yield
+            return
+        with self.trace.span(name):
+            yield
+
+    def write_report(self, stream):
+        """Reports on the parts of the run outside the test suite."""
+        if self.import_timer:
+            self.import_timer.write_report(stream, self.test_modules)
+        if self.database_timer:
+            self.database_timer.write_report(stream)
+        if self.snapshots:
+            self.snapshots.write_report(stream)
+
+    def setup_databases(self, **kwargs):
+        with self.traced('setup databases'):
+            if self.benchmark and self.bench_db_cache:
+                self.snapshots = DatabaseSnapshots(self.bench_db_cache)
+                with self.snapshots.restoring():
+                    return self.timed_setup_databases(**kwargs)
+            return self.timed_setup_databases(**kwargs)
+
+    def timed_setup_databases(self, **kwargs):
+        if not (self.benchmark and self.bench_databases):
+            return super(BenchRunner, self).setup_databases(**kwargs)
+        self.database_timer = DatabaseTimer(
+            keepdb=self.keepdb, parallel=self.parallel
+        )
+        with self.database_timer.setting_up():
+            return super(BenchRunner, self).setup_databases(**kwargs)
+
+    def teardown_databases(self, old_config, **kwargs):
+        with self.traced('teardown databases'):
+            if not self.database_timer:
+                return super(BenchRunner, self).teardown_databases(
+                    old_config, **kwargs
+                )
+            with self.database_timer.tearing_down():
+                return super(BenchRunner, self).teardown_databases(
+                    old_config, **kwargs
+                )
+
+    def build_suite(self, *args, **kwargs):
+        with self.traced('build suite'):
+            if self.benchmark and self.bench_imports:
+                self.import_timer = ImportTimer()
+                with self.import_timer:
+                    suite = super(BenchRunner, self).build_suite(
+                        *args, **kwargs
+                    )
+                self.test_modules = set(
+                    test.__module__ for test in iter_tests(suite)
+                )
+            else:
+                suite = super(BenchRunner, self).build_suite(*args, **kwargs)
+
+        # Sharding only picks tests, so it applies without --benchmark too
+        if self.bench_shard:
+            suite = self.shard_suite(suite)
+
+        repeat = self.benchmark and self.bench_repeat > 1
+        if not isinstance(suite, ParallelTestSuite):
+            if repeat:
+                suite = repeat_tests(suite, self.bench_repeat)
+            return suite
+
+        if repeat:
+            suite.subsuites = [
+                repeat_tests(subsuite, self.bench_repeat)
+                for subsuite in suite.subsuites
+            ]
+
+        timings = load_timings(self.bench_timings)
+        if timings:
+            suite.subsuites = partition_by_timing(
+                suite.subsuites, suite.processes, timings
+            )
+        if self.benchmark:
+            # Workers time their own tests and send the records back
+            suite.runner_class = partial(
+                BenchRemoteTestRunner,
+                benchmark=self.benchmark,
+                collectors=self.get_collectors(),
+                stream=self.bench_stream,
+                repeat=repeat,
+            )
+        return suite
+
+    def shard_suite(self, suite):
+        """Keeps only the tests of this machine's --shard."""
+        index, total = self.bench_shard
+        tests = shard_tests(
+            list(iter_tests(suite)), index, total,
+            load_timings(self.bench_timings)
+        )
+        if not isinstance(suite, ParallelTestSuite):
+            return type(suite)(tests)
+
+        tests = set(tests)
+        subsuites = [
+            type(subsuite)(test for test in subsuite if test in tests)
+            for subsuite in suite.subsuites
+        ]
+        suite.subsuites = [
+            subsuite for subsuite in subsuites if subsuite.countTestCases()
+        ]
+        return suite
 
     def run_suite(self, suite, **kwargs):
         resultclass = self.get_resultclass()
-        return self.test_runner(
+        history = None
+        if self.benchmark and self.bench_history:
+            history = BenchHistory(
+                self.bench_history, factor=self.bench_regression_factor
+            )
+        if self.benchmark and self.bench_stream:
+            RecordStream(self.bench_stream).truncate()
+        runner = self.test_runner(
             verbosity=self.verbosity,
             failfast=self.failfast,
             resultclass=resultclass,
             benchmark=self.benchmark,
-        ).run(suite)
+            collectors=self.get_collectors(),
+            history=history,
+            parallel=isinstance(suite, ParallelTestSuite),
+            bench_stream=self.bench_stream if self.benchmark else None,
+            repeat=self.benchmark and self.bench_repeat > 1,
+            top=self.bench_top,
+            rollup=self.bench_rollup,
+            budgets=Budgets() if self.benchmark else None,
+            soft_budgets=self.bench_soft_budgets,
+        )
+        with self.traced('run tests'):
+            result = runner.run(suite)
+        if self.trace:
+            self.trace.add_tests(result.bench_dict, result.class_dict)
+        if self.benchmark and self.bench_timings:
+            path = self.bench_timings
+            if self.bench_shard:
+                path = shard_timings_path(path, self.bench_shard[0])
+            save_timings(path, result.bench_dict)
+        if self.benchmark and self.bench_output:
+            write_output(self.bench_output, self.bench_output_file, result)
+        return result
+
+    def suite_result(self, suite, result, **kwargs):
+        failures = super(BenchRunner, self).suite_result(suite, result, **kwargs)
+        if self.bench_fail_regressions:
+            failures += len(result.regressions)
+        if not self.bench_soft_budgets:
+            failures += len(result.over_budget)
+        return failures
@@ -0,0 +1,128 @@
+from collections import Counter, defaultdict
+import os
+import signal
+import unittest
+
+from .collectors import Collector
+from .tabulate import tabulate
+
+# Stacks are cut off where unittest starts running the test
+TEST_RUN_CODE = unittest.TestCase.run.__code__
+
+
+def short_path(filename):
+    """Path relative to the working directory, or its last two parts."""
+    cwd = os.getcwd()
+    if filename.startswith(cwd + os.sep):
+        return filename[len(cwd) + 1:]
+    return os.sep.join(filename.split(os.sep)[-2:])
+
+
+def code_label(code):
+    return "{} ({}:{})".format(
+        code.co_name, short_path(code.co_filename), code.co_firstlineno
+    )
+
+
+class SamplingProfiler(Collector):
+    """
+    Statistical profiler for the whole suite.
+
+    A SIGPROF timer interrupts the process every `interval` seconds of CPU
+    time and the stack of the running test is counted under that test's
+    record, so the overhead stays the same however many functions run.
+    Samples are folded into `path` for flamegraph tools, with each test
+    as the root frame, and summed into a hotspot table in the report.
+    Needs setitimer, so it does nothing on Windows or outside the main
+    thread.
+    """
+
+    def __init__(self, path, interval=0.005, top=15):
+        self.path = path
+        self.interval = interval
+        self.top = top
+        self.running = False
+        self.samples = None
+        self.labels = {}
+
+    def sample(self, signum, frame):
+        if self.samples is None:
+            return
+        labels = self.labels
+        stack = []
+        while frame is not None and frame.f_code is not TEST_RUN_CODE:
+            code = frame.f_code
+            label = labels.get(code)
+            if label is None:
+                label = labels[code] = code_label(code)
+            stack.append(label)
+            frame = frame.f_back
+        stack.reverse()
+        self.samples[';'.join(stack)] += 1
+
+    def start(self):
+        if not hasattr(signal, 'setitimer'):
+            return
+        try:
+            signal.signal(signal.SIGPROF, self.sample)
+        except ValueError:
+            # Signals can only be handled in the main thread
+            return
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        self.running = True
+
+    def stop(self):
+        if self.running:
+            signal.setitimer(signal.ITIMER_PROF, 0)
+            signal.signal(signal.SIGPROF, signal.SIG_DFL)
+            self.running = False
+
+    def start_test(self, test, record):
+        # The timer keeps running between tests so that short tests are
+        # sampled as often as their share of the run
+        if not self.running:
+            self.start()
+        self.samples = Counter()
+
+    def stop_test(self, test, record):
+        samples, self.samples = self.samples, None
+        record['samples'] = dict(samples)
+
+    def write_report(self, stream, bench_dict, class_dict):
+        self.stop()
+        own = Counter()
+        total = Counter()
+        tests = defaultdict(set)
+        with open(self.path, 'w') as f:
+            for uniq, record in bench_dict.items():
+                for stack, count in record.get('samples', {}).items():
+                    f.write("{};{} {}\n".format(uniq, stack, count))
+                    frames = stack.split(';')
+                    own[frames[-1]] += count
+                    for frame in set(frames):
+                        total[frame] += count
+                        tests[frame].add(uniq)
+
+        sample_count = float(sum(own.values()))
+        if not sample_count:
+            return
+        stream.writeln()
+        stream.writeln("{:d} samples written to {}".format(
+            int(sample_count), self.path
+        ))
+        stream.writeln()
+        stream.writeln(tabulate(
+            [
+                {
+                    "Hotspots": label,
+                    "Own": "{:>6.2f}%".format(count / sample_count * 100),
+                    "Total": "{:>6.2f}%".format(
+                        total[label] / sample_count * 100
+                    ),
+                    "Tests": len(tests[label]),
+                }
+                for label, count in own.most_common(self.top)
+            ],
+            headers="keys",
+            aligns=('left', 'right', 'right', 'right')
+        ))
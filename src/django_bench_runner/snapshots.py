@@ -0,0 +1,170 @@
+"""
+Snapshots of migrated test databases, reused while migrations and models
+stay the same.
+"""
+from contextlib import contextmanager
+import hashlib
+import importlib
+import json
+import os
+import sqlite3
+
+import django
+from django.apps import apps
+from django.core.management.commands import migrate
+from django.core.management.sql import (
+    emit_post_migrate_signal, emit_pre_migrate_signal
+)
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.loader import MigrationLoader
+
+from .clock import clock
+from .tabulate import tabulate
+
+
+def module_files(module):
+    """Source files of a module, or of every module in a package."""
+    if hasattr(module, '__path__'):
+        for directory in module.__path__:
+            for root, dirs, files in sorted(os.walk(directory)):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.endswith('.py'):
+                        yield os.path.join(root, name)
+    elif getattr(module, '__file__', None):
+        yield module.__file__
+
+
+def migration_state_key():
+    """
+    Hash of everything that decides the schema a test database migrates
+    to: the Django version and each app's models and migration files.
+    """
+    digest = hashlib.sha1(django.get_version().encode('utf-8'))
+    for app_config in apps.get_app_configs():
+        digest.update(app_config.label.encode('utf-8'))
+        modules = [app_config.models_module]
+        module_name = MigrationLoader.migrations_module(app_config.label)[0]
+        if module_name:
+            try:
+                modules.append(importlib.import_module(module_name))
+            except ImportError:
+                pass
+        for module in modules:
+            if module is None:
+                continue
+            for path in module_files(module):
+                digest.update(os.path.basename(path).encode('utf-8'))
+                with open(path, 'rb') as f:
+                    digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+class DatabaseSnapshots(object):
+    """
+    Saves each test database right after it is migrated, and on later runs
+    restores the saved copy in place of running migrate.
+
+    Snapshots are named after the alias and migration_state_key(), so any
+    change to models or migrations migrates afresh.  Only SQLite databases
+    can be snapshotted; other backends migrate as usual.
+
+    A restore still sends pre_migrate and post_migrate, with an empty
+    plan, so handlers that set up more than the database see a restored
+    database the way they see a migrated one.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.key = migration_state_key()
+        self.results = []
+
+    def snapshot_path(self, alias):
+        return os.path.join(
+            self.directory, "{}-{}.sqlite3".format(alias, self.key)
+        )
+
+    @contextmanager
+    def restoring(self):
+        snapshots = self
+        original_handle = migrate.Command.handle
+
+        def handle(command, *args, **options):
+            return snapshots.migrate(original_handle, command, args, options)
+
+        migrate.Command.handle = handle
+        try:
+            yield
+        finally:
+            migrate.Command.handle = original_handle
+
+    def migrate(self, handle, command, args, options):
+        alias = options.get('database') or DEFAULT_DB_ALIAS
+        connection = connections[alias]
+        if connection.vendor != 'sqlite':
+            start = clock()
+            handle(command, *args, **options)
+            self.results.append((alias, 'unsupported', clock() - start, None))
+            return
+
+        path = self.snapshot_path(alias)
+        start = clock()
+        if os.path.exists(path):
+            with open(path + '.json') as f:
+                migrate_time = json.load(f)['migrate']
+            signal_args = (
+                options.get('verbosity', 1), options.get('interactive', False),
+                alias
+            )
+            emit_pre_migrate_signal(*signal_args, apps=apps, plan=[])
+            self.restore(connection, path)
+            emit_post_migrate_signal(*signal_args, apps=apps, plan=[])
+            elapsed = clock() - start
+            self.results.append((alias, 'hit', elapsed, migrate_time - elapsed))
+            return
+
+        handle(command, *args, **options)
+        elapsed = clock() - start
+        self.save(connection, path, elapsed)
+        self.results.append((alias, 'miss', elapsed, None))
+
+    def restore(self, connection, path):
+        connection.ensure_connection()
+        snapshot = sqlite3.connect(path)
+        try:
+            snapshot.backup(connection.connection)
+        finally:
+            snapshot.close()
+
+    def save(self, connection, path, migrate_time):
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        connection.ensure_connection()
+        partial_path = path + '.partial'
+        snapshot = sqlite3.connect(partial_path)
+        try:
+            connection.connection.backup(snapshot)
+        finally:
+            snapshot.close()
+        with open(path + '.json', 'w') as f:
+            json.dump({'migrate': migrate_time}, f)
+        os.rename(partial_path, path)
+
+    def write_report(self, stream):
+        if not self.results:
+            return
+        stream.writeln()
+        stream.writeln(tabulate(
+            [
+                {
+                    "Snapshot " + self.key: alias,
+                    "Result": result,
+                    "Runtime": runtime,
+                    "Saved": saved,
+                }
+                for alias, result, runtime, saved in self.results
+            ],
+            headers="keys",
+            floatfmt=".5f",
+            aligns=('left', 'left', 'right', 'right')
+        ))
@@ -0,0 +1,90 @@
+"""
+Line-delimited JSON log of benchmark records, written as tests finish.
+
+Every line is one JSON object: {"started": id, "start": t} when a test
+starts, {"test": id, "record": {...}} when it finishes and {"class": id,
+"record": {...}} for class-level setup and teardown.  Parallel workers
+append to the same file, so a run that is killed still leaves the
+records of every test that finished and shows which ones never did.
+"""
+from collections import OrderedDict
+import json
+import os
+import warnings
+
+
+class RecordStream(object):
+    """
+    Each line is written with a single write(2) to a file opened with
+    O_APPEND, which the kernel appends whole, so lines from parallel
+    workers don't mix however long they are.  The file is opened for
+    each line, so workers are left with no handle to close.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def truncate(self):
+        open(self.path, 'w').close()
+
+    def write(self, entry):
+        data = (json.dumps(entry) + '\n').encode('utf-8')
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            written = os.write(fd, data)
+            # Only a full disk or a signal cuts a write to a file short
+            while written < len(data):
+                written += os.write(fd, data[written:])
+        finally:
+            os.close(fd)
+
+    def write_start(self, uniq, start):
+        self.write({'started': uniq, 'start': start})
+
+    def write_test(self, uniq, record):
+        self.write({'test': uniq, 'record': record})
+
+    def write_class(self, uniq, record):
+        self.write({'class': uniq, 'record': record})
+
+    def close(self):
+        pass
+
+    def load(self):
+        """
+        Reads the finished tests back as (bench_dict, class_dict), with the
+        tests of each class kept together in the order classes started.
+        """
+        tests = []
+        class_dict = OrderedDict()
+        skipped = []
+        with open(self.path) as f:
+            for number, line in enumerate(f, 1):
+                try:
+                    entry = json.loads(line, object_pairs_hook=OrderedDict)
+                except ValueError:
+                    # The last line of a killed run may be cut short
+                    skipped.append(number)
+                    continue
+                if 'test' in entry:
+                    tests.append((entry['test'], entry['record']))
+                elif 'class' in entry:
+                    class_dict.setdefault(entry['class'], {}).update(
+                        entry['record']
+                    )
+        if skipped:
+            warnings.warn(
+                "Skipped {} unreadable line(s) of {}: {}".format(
+                    len(skipped), self.path,
+                    ", ".join(str(number) for number in skipped)
+                )
+            )
+
+        class_order = {}
+        for uniq, record in tests:
+            class_uniq = (record['module'], record['class_name'])
+            class_order.setdefault(class_uniq, len(class_order))
+        tests.sort(key=lambda test: class_order[
+            (test[1]['module'], test[1]['class_name'])
+        ])
+        return OrderedDict(tests), class_dict
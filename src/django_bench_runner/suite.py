@@ -0,0 +1,113 @@
+from collections import OrderedDict
+import unittest
+
+from django.core.management.commands import loaddata
+from django.test import TestCase
+
+from .clock import clock
+from .phases import timed
+
+_missing = object()
+
+
+def class_record(test_class):
+    return {
+        'module': test_class.__module__,
+        'class_name': test_class.__name__,
+    }
+
+
+def overrides_setup_test_data(test_class):
+    method = getattr(test_class, 'setUpTestData', None)
+    return method is not None and (
+        method.__func__ is not TestCase.setUpTestData.__func__
+    )
+
+
+class ClassSetUpTimer(object):
+    """
+    Times a class's setUpClass, breaking out setUpTestData and each
+    fixture file loaded during it.
+    """
+
+    def __init__(self, test_class):
+        self.test_class = test_class
+        self.record = class_record(test_class)
+        self.record['setup_test_data'] = 0.0
+        self.record['fixtures'] = OrderedDict()
+
+    def load_label(self, command, fixture_label):
+        start = clock()
+        try:
+            return self.original_load_label(command, fixture_label)
+        finally:
+            stop = clock()
+            fixtures = self.record['fixtures']
+            fixtures[fixture_label] = (
+                fixtures.get(fixture_label, 0) + stop - start
+            )
+            self.record.setdefault('spans', []).append(
+                ('fixture ' + fixture_label, start, stop)
+            )
+
+    def __enter__(self):
+        timer = self
+        self.original_load_label = loaddata.Command.load_label
+        loaddata.Command.load_label = (
+            lambda command, label: timer.load_label(command, label)
+        )
+
+        self.original_test_data = _missing
+        if overrides_setup_test_data(self.test_class):
+            self.original_test_data = self.test_class.__dict__.get(
+                'setUpTestData', _missing
+            )
+            self.test_class.setUpTestData = staticmethod(timed(
+                self.test_class.setUpTestData, self.record, 'setup_test_data'
+            ))
+
+        self.start = clock()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.record['setup_start'] = self.start
+        self.record['setup'] = clock() - self.start
+        loaddata.Command.load_label = self.original_load_label
+        if self.original_test_data is not _missing:
+            setattr(self.test_class, 'setUpTestData', self.original_test_data)
+        elif 'setUpTestData' in self.test_class.__dict__:
+            delattr(self.test_class, 'setUpTestData')
+
+
+class BenchTestSuite(unittest.TestSuite):
+    """
+    TestSuite that times class-level setup and teardown, which happen
+    outside of startTest and stopTest, and hands them to the result.
+    """
+
+    def _handleClassSetUp(self, test, result):
+        previous_class = getattr(result, '_previousTestClass', None)
+        if (test.__class__ == previous_class or
+                not getattr(result, 'benchmark', False)):
+            return super(BenchTestSuite, self)._handleClassSetUp(test, result)
+
+        timer = ClassSetUpTimer(test.__class__)
+        result.startClassBench(test, timer.record)
+        with timer:
+            super(BenchTestSuite, self)._handleClassSetUp(test, result)
+        result.addClassBench(test, timer.record)
+
+    def _tearDownPreviousClass(self, test, result):
+        previous_class = getattr(result, '_previousTestClass', None)
+        if (previous_class is None or test.__class__ == previous_class or
+                not getattr(result, 'benchmark', False)):
+            return super(BenchTestSuite, self)._tearDownPreviousClass(
+                test, result
+            )
+
+        start = clock()
+        super(BenchTestSuite, self)._tearDownPreviousClass(test, result)
+        record = class_record(previous_class)
+        record['teardown_start'] = start
+        record['teardown'] = clock() - start
+        result.addClassBench(test, record)
@@ -0,0 +1,170 @@
+"""
+Per-test runtimes kept from earlier benchmark runs.
+
+The timings file is a JSON object mapping test ids (module.Class.test)
+to the seconds each test took the last time it was benchmarked.
+
+Shards of a suite split across machines write their timings to files
+of their own, merged back with:
+
+    python -m django_bench_runner.timings timings.json timings.*.json
+"""
+from collections import OrderedDict
+import heapq
+import json
+import math
+import os
+import sys
+
+# Used for every test when no timings have been recorded at all
+DEFAULT_RUNTIME = 0.1
+
+
+def load_timings(path):
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_timings(path, bench_dict):
+    """
+    Adds the runtimes of a benchmarked run to the timings file, keeping
+    the entries of tests that did not run this time.
+    """
+    timings = load_timings(path)
+    for uniq, runtimes in bench_dict.items():
+        if 'stop' in runtimes:
+            timings[uniq] = runtimes.get(
+                'runtime', runtimes['stop'] - runtimes['start']
+            )
+    write_timings(path, timings)
+    return timings
+
+
+def write_timings(path, timings):
+    with open(path, 'w') as f:
+        json.dump(timings, f, indent=0, sort_keys=True)
+
+
+def shard_timings_path(path, index):
+    """Where shard `index` saves its timings: timings.json -> timings.2.json"""
+    root, ext = os.path.splitext(path)
+    return "{}.{}{}".format(root, index, ext)
+
+
+def merge_timings(path, shard_paths):
+    """Adds the timings saved by each shard to the timings file."""
+    timings = load_timings(path)
+    for shard_path in shard_paths:
+        timings.update(load_timings(shard_path))
+    write_timings(path, timings)
+    return timings
+
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+
+def run_stats(runs):
+    """
+    Summary of the runtimes of a repeated test: min, median, p95 (nearest
+    rank), sample standard deviation and coefficient of variation.
+    """
+    runs = sorted(runs)
+    mean = sum(runs) / len(runs)
+    stddev = 0.0
+    if len(runs) > 1:
+        stddev = math.sqrt(
+            sum((run - mean) ** 2 for run in runs) / (len(runs) - 1)
+        )
+    return {
+        'min': runs[0],
+        'median': median(runs),
+        'p95': runs[int(math.ceil(0.95 * len(runs))) - 1],
+        'stddev': stddev,
+        'cv': stddev / mean if mean else 0.0,
+    }
+
+
+def fallback_runtime(timings):
+    """Estimate for tests never timed: the median of the known ones."""
+    if not timings:
+        return DEFAULT_RUNTIME
+    return median(timings.values())
+
+
+def estimate_runtime(tests, timings, fallback=None):
+    if fallback is None:
+        fallback = fallback_runtime(timings)
+    return sum(timings.get(test.id(), fallback) for test in tests)
+
+
+def partition_by_timing(subsuites, processes, timings):
+    """
+    Packs the per-class subsuites into one suite per process so that each
+    finishes in about the same time.
+
+    Classes are taken longest first and each goes to the partition with
+    the least work so far.  Within a partition, classes keep the order
+    they had in `subsuites`, so Django's TestCases still run before its
+    TransactionTestCases.  Partitions come back longest first.
+    """
+    fallback = fallback_runtime(timings)
+    costs = sorted(
+        ((estimate_runtime(subsuite, timings, fallback), index)
+         for index, subsuite in enumerate(subsuites)),
+        reverse=True,
+    )
+
+    partitions = [(0, index, []) for index in range(processes)]
+    for cost, index in costs:
+        load, partition, indexes = heapq.heappop(partitions)
+        indexes.append(index)
+        heapq.heappush(partitions, (load + cost, partition, indexes))
+
+    suite_class = type(subsuites[0])
+    return [
+        suite_class(
+            test for index in sorted(indexes) for test in subsuites[index]
+        )
+        for load, partition, indexes in sorted(partitions, reverse=True)
+        if indexes
+    ]
+
+
+def shard_tests(tests, index, total, timings):
+    """
+    The tests of shard `index` of `total`, counting from 1, so that every
+    shard takes about the same time.
+
+    Whole classes are packed like partition_by_timing packs them, ties
+    broken by class name, so every machine given the same tests and
+    timings picks the same shards.
+    """
+    classes = OrderedDict()
+    for test in tests:
+        classes.setdefault(test.id().rsplit('.', 1)[0], []).append(test)
+
+    fallback = fallback_runtime(timings)
+    costs = sorted(
+        (-estimate_runtime(class_tests, timings, fallback), class_uniq)
+        for class_uniq, class_tests in classes.items()
+    )
+
+    shards = [(0, shard) for shard in range(1, total + 1)]
+    chosen = set()
+    for cost, class_uniq in costs:
+        load, shard = heapq.heappop(shards)
+        if shard == index:
+            chosen.add(class_uniq)
+        heapq.heappush(shards, (load - cost, shard))
+    return [test for test in tests if test.id().rsplit('.', 1)[0] in chosen]
+
+
+if __name__ == '__main__':
+    merge_timings(sys.argv[1], sys.argv[2:])
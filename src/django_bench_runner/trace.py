@@ -0,0 +1,105 @@
+"""
+Timeline of a run in the Chrome trace-event format, for chrome://tracing,
+Perfetto or speedscope.
+"""
+from contextlib import contextmanager
+import json
+
+from .clock import clock
+
+
+class Trace(object):
+    """
+    Collects (name, category, start, stop, track) spans and writes them
+    as complete events, nested by time within each track.
+
+    Track 0 is the main process; parallel workers get a track each,
+    numbered by their worker id.  Workers use the same monotonic clock,
+    so their spans line up with the main process.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.spans = []
+
+    def add(self, name, category, start, stop, track=0, args=None):
+        self.spans.append((name, category, start, stop, track, args))
+
+    @contextmanager
+    def span(self, name, category='runner'):
+        start = clock()
+        try:
+            yield
+        finally:
+            self.add(name, category, start, clock())
+
+    def add_database_timer(self, timer):
+        for label, start, stop in timer.spans:
+            self.add(label, 'database', start, stop)
+
+    def add_tests(self, bench_dict, class_dict):
+        class_stops = {}
+        for uniq, record in bench_dict.items():
+            if 'stop' not in record:
+                continue
+            track = record.get('worker', 0)
+            self.add(
+                record['test_name'], 'test', record['start'], record['stop'],
+                track, {'id': uniq},
+            )
+            for label, start, stop in record.get('spans', ()):
+                self.add(label, 'phase', start, stop, track)
+            class_uniq = "{}.{}".format(record['module'], record['class_name'])
+            class_stops[class_uniq] = record['stop']
+
+        for class_uniq, record in class_dict.items():
+            if 'setup_start' not in record:
+                continue
+            track = record.get('worker', 0)
+            start = record['setup_start']
+            stop = class_stops.get(class_uniq, start + record['setup'])
+            if 'teardown_start' in record:
+                stop = record['teardown_start'] + record['teardown']
+                self.add(
+                    'tearDownClass', 'class', record['teardown_start'], stop,
+                    track,
+                )
+            self.add(class_uniq, 'class', start, stop, track)
+            self.add(
+                'setUpClass', 'class', start, start + record['setup'], track
+            )
+            for label, span_start, span_stop in record.get('spans', ()):
+                self.add(label, 'class', span_start, span_stop, track)
+
+    def events(self):
+        if not self.spans:
+            return []
+        origin = min(span[2] for span in self.spans)
+        events = []
+        for track in sorted(set(span[4] for span in self.spans)):
+            events.append({
+                'name': 'thread_name', 'ph': 'M', 'pid': 0, 'tid': track,
+                'args': {'name': "worker {}".format(track) if track else 'main'},
+            })
+        # Outer spans first, so viewers nest spans that start together
+        for name, category, start, stop, track, args in sorted(
+                self.spans, key=lambda span: (span[2], -span[3])):
+            event = {
+                'name': name,
+                'cat': category,
+                'ph': 'X',
+                'ts': (start - origin) * 1e6,
+                'dur': (stop - start) * 1e6,
+                'pid': 0,
+                'tid': track,
+            }
+            if args:
+                event['args'] = args
+            events.append(event)
+        return events
+
+    def write(self):
+        with open(self.path, 'w') as f:
+            json.dump(
+                {'traceEvents': self.events(), 'displayTimeUnit': 'ms'}, f
+            )
@@ -0,0 +1,203 @@
+"""
+Cost of the database resets TransactionTestCase does around every test,
+and whether its classes need real transactions at all.
+"""
+from django.core.management.commands import flush, loaddata
+from django.db import transaction
+from django.db.backends.base.base import BaseDatabaseWrapper
+from django.db.backends.base.creation import BaseDatabaseCreation
+from django.db.models.query import QuerySet
+from django.test import LiveServerTestCase, TestCase, TransactionTestCase
+
+from .clock import clock
+from .collectors import Collector
+from .table import Table
+
+
+def needs_transactions(test):
+    """Reasons a test case class needs real transactions up front."""
+    reasons = []
+    if isinstance(test, LiveServerTestCase):
+        reasons.append('live server')
+    if test.reset_sequences:
+        reasons.append('reset_sequences')
+    return reasons
+
+
+class TransactionCollector(Collector):
+    """
+    Times the flush after each TransactionTestCase test, and the
+    serialized_rollback deserialization and fixture loading before it.
+
+    These run in the test case's _pre_setup and _post_teardown, outside
+    startTest and stopTest, so they are added up per class and stored on
+    its teardown record.  Costs are counted from the class's first test
+    on; Django 5.2 and later set that test up eagerly in setUpClass, so
+    its share is counted there instead.
+
+    While a class's tests run, the calls that only behave differently
+    outside TestCase's wrapping transaction are watched for: on_commit
+    callbacks, durable atomic blocks, explicit commits, rollbacks and
+    autocommit changes, and select_for_update.  Classes none of them were
+    seen in could likely be TestCases.
+    """
+
+    costs = (
+        ('flush_time', flush.Command, 'handle'),
+        (
+            'deserialize_time', BaseDatabaseCreation,
+            'deserialize_db_from_string'
+        ),
+        ('fixture_time', loaddata.Command, 'handle'),
+    )
+    uses = (
+        ('on_commit', BaseDatabaseWrapper, 'on_commit'),
+        ('commit', transaction, 'commit'),
+        ('rollback', transaction, 'rollback'),
+        ('autocommit', transaction, 'set_autocommit'),
+        ('select_for_update', QuerySet, 'select_for_update'),
+    )
+
+    def __init__(self, top=10):
+        self.top = top
+        self.saved = []
+        self.record = None
+        self.counting = False
+        self.in_test = False
+
+    def timed(self, key, method):
+        collector = self
+
+        def wrapper(*args, **kwargs):
+            start = clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                if collector.counting:
+                    collector.record[key] += clock() - start
+
+        return wrapper
+
+    def watched(self, reason, method):
+        collector = self
+
+        def wrapper(*args, **kwargs):
+            if collector.in_test:
+                collector.record['transaction_uses'].add(reason)
+            return method(*args, **kwargs)
+
+        return wrapper
+
+    def atomic_enter(self, method, atomic):
+        if self.in_test and atomic.durable:
+            self.record['transaction_uses'].add('durable atomic')
+        return method(atomic)
+
+    def patch(self, owner, name, wrapper):
+        original = owner.__dict__[name]
+        self.saved.append((owner, name, original))
+        setattr(owner, name, wrapper(original))
+
+    def restore(self):
+        for owner, name, original in reversed(self.saved):
+            setattr(owner, name, original)
+        self.saved = []
+
+    def start_class(self, record):
+        self.restore()
+        self.counting = False
+        self.record = {
+            'flush_time': 0.0,
+            'deserialize_time': 0.0,
+            'fixture_time': 0.0,
+            'transaction_tests': 0,
+            'transaction_uses': set(),
+        }
+        for key, owner, name in self.costs:
+            self.patch(
+                owner, name, lambda method, key=key: self.timed(key, method)
+            )
+        for reason, owner, name in self.uses:
+            self.patch(
+                owner, name,
+                lambda method, reason=reason: self.watched(reason, method)
+            )
+        self.patch(
+            transaction.Atomic, '__enter__',
+            lambda method: (
+                lambda atomic: self.atomic_enter(method, atomic)
+            )
+        )
+
+    def stop_class(self, record):
+        self.restore()
+        if self.record is None:
+            return
+        if self.record['transaction_tests']:
+            self.record['transaction_uses'] = sorted(
+                self.record['transaction_uses']
+            )
+            record.update(self.record)
+        self.record = None
+
+    def start_test(self, test, record):
+        if self.record is None:
+            return
+        if (isinstance(test, TransactionTestCase) and
+                not isinstance(test, TestCase)):
+            self.record['transaction_tests'] += 1
+            self.record['transaction_uses'].update(needs_transactions(test))
+        self.counting = self.in_test = True
+
+    def stop_test(self, test, record):
+        self.in_test = False
+
+    def write_report(self, stream, bench_dict, class_dict):
+        candidates = []
+        needed = []
+        for class_uniq, record in class_dict.items():
+            if not record.get('transaction_tests'):
+                continue
+            if record['transaction_uses']:
+                needed.append((class_uniq, record['transaction_uses']))
+                continue
+            total = (record['flush_time'] + record['deserialize_time'] +
+                     record['fixture_time'])
+            candidates.append((total, class_uniq, record))
+        if not candidates and not needed:
+            return
+
+        if candidates:
+            candidates.sort(key=lambda item: item[0], reverse=True)
+            table = Table(
+                ["Could be TestCase", "Tests", "Flush", "Deserialize",
+                 "Fixtures", "Total"],
+                ('left', 'right', 'right', 'right', 'right', 'right')
+            )
+            table.extend(
+                {
+                    "Could be TestCase": class_uniq,
+                    "Tests": "{:d}".format(record['transaction_tests']),
+                    "Flush": "{:.5f}".format(record['flush_time']),
+                    "Deserialize": "{:.5f}".format(record['deserialize_time']),
+                    "Fixtures": "{:.5f}".format(record['fixture_time']),
+                    "Total": "{:.5f}".format(total),
+                }
+                for total, class_uniq, record in candidates[:self.top]
+            )
+            if self.top and len(candidates) > self.top:
+                table.add({
+                    "Could be TestCase": "({} more)".format(
+                        len(candidates) - self.top
+                    )
+                })
+            stream.writeln()
+            table.write(stream)
+
+        if needed:
+            stream.writeln()
+            stream.writeln("Transactions used by:")
+            for class_uniq, reasons in needed:
+                stream.writeln(
+                    "  {} ({})".format(class_uniq, ", ".join(reasons))
+                )
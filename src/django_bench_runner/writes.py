@@ -0,0 +1,142 @@
+from collections import defaultdict
+
+from django.db.models.signals import post_delete, post_save
+
+from .collectors import Collector, Metric
+from .table import Table
+
+CREATED, UPDATED, DELETED = range(3)
+
+
+def model_label(model):
+    return model._meta.label
+
+
+class WriteCollector(Collector):
+    """
+    Counts the model instances each test creates, updates and deletes,
+    per model, from the post_save and post_delete signals.
+
+    Writes made while a class is set up, setUpTestData included, are
+    kept on the class's setup record.  A test or class that saves or
+    updates `bulk_threshold` or more instances of one model one at a
+    time is listed at the end as a candidate for bulk_create or
+    bulk_update.  Bulk operations and QuerySet.update send no signals,
+    so they are not counted, and neither are fixtures, which are saved
+    raw.
+    """
+
+    metrics = (
+        Metric('Created', 'created', '{:d}'),
+        Metric('Updated', 'updated', '{:d}'),
+        Metric('Deleted', 'deleted', '{:d}'),
+    )
+
+    def __init__(self, bulk_threshold=20, top=10):
+        self.bulk_threshold = bulk_threshold
+        self.top = top
+        self.record = None
+
+    def count(self, record, model, action):
+        counts = record['writes'].setdefault(model_label(model), [0, 0, 0])
+        counts[action] += 1
+
+    def saved(self, sender, created=False, raw=False, **kwargs):
+        if self.record is None or raw:
+            return
+        self.count(self.record, sender, CREATED if created else UPDATED)
+
+    def deleted(self, sender, **kwargs):
+        if self.record is not None:
+            self.count(self.record, sender, DELETED)
+
+    def start_class(self, record):
+        record['writes'] = {}
+        self.record = record
+        post_save.connect(self.saved)
+        post_delete.connect(self.deleted)
+
+    def stop_class(self, record):
+        post_save.disconnect(self.saved)
+        post_delete.disconnect(self.deleted)
+        self.record = None
+
+    def start_test(self, test, record):
+        record['writes'] = {}
+        self.record = record
+
+    def stop_test(self, test, record):
+        self.record = None
+        for action, key in enumerate(('created', 'updated', 'deleted')):
+            record[key] = sum(
+                counts[action] for counts in record['writes'].values()
+            )
+
+    def bulk_candidates(self, record):
+        """(operation, model, count) for the writes of a record."""
+        candidates = []
+        for label, counts in sorted(record.get('writes', {}).items()):
+            for operation, count in (
+                    ('bulk_create', counts[CREATED]),
+                    ('bulk_update', counts[UPDATED])):
+                if count >= self.bulk_threshold:
+                    candidates.append((operation, label, count))
+        return candidates
+
+    def report_rows(self, record):
+        return [
+            {"Test": "{} {} ({:d} saves)".format(operation, label, count)}
+            for operation, label, count in self.bulk_candidates(record)
+        ]
+
+    def write_report(self, stream, bench_dict, class_dict):
+        # [created, updated, deleted, tests] by model
+        totals = defaultdict(lambda: [0, 0, 0, 0])
+        candidates = []
+        sources = [
+            (uniq, record, 1) for uniq, record in bench_dict.items()
+        ] + [
+            (uniq + ' (class setup)', record, 0)
+            for uniq, record in class_dict.items()
+        ]
+        for uniq, record, tests in sources:
+            for label, counts in record.get('writes', {}).items():
+                total = totals[label]
+                for action, count in enumerate(counts):
+                    total[action] += count
+                total[3] += tests
+            candidates.extend(
+                (count, uniq, operation, label)
+                for operation, label, count in self.bulk_candidates(record)
+            )
+        if not totals:
+            return
+
+        table = Table(
+            ["Model writes", "Created", "Updated", "Deleted", "Tests"],
+            ('left', 'right', 'right', 'right', 'right')
+        )
+        table.extend(
+            {
+                "Model writes": label,
+                "Created": "{:d}".format(created),
+                "Updated": "{:d}".format(updated),
+                "Deleted": "{:d}".format(deleted),
+                "Tests": "{:d}".format(tests),
+            }
+            for label, (created, updated, deleted, tests) in sorted(
+                totals.items(), key=lambda item: sum(item[1][:3]),
+                reverse=True
+            )[:self.top]
+        )
+        stream.writeln()
+        table.write(stream)
+
+        if candidates:
+            candidates.sort(key=lambda item: item[0], reverse=True)
+            stream.writeln()
+            stream.writeln("Saved one at a time:")
+            for count, uniq, operation, label in candidates[:self.top]:
+                stream.writeln("  {} {:d} {} -> {}".format(
+                    uniq, count, label, operation
+                ))
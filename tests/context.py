@@ -5,10 +5,7 @@ import os
 sys.path.insert(0, os.path.abspath('./src/'))
 
 # Add capture context_manager to test sys.out
-try:
-    from StringIO import StringIO
-except ImportError:
-    from io import StringIO
+from io import StringIO
 from contextlib import contextmanager
 
 @contextmanager
@@ -18,3 +15,18 @@ def capture(command, *args, **kwargs):
     sys.stdout.seek(0)
     yield sys.stdout.read()
     sys.stdout = out
+
+# Minimal django configuration for the runner's collectors
+import django
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure(
+        DATABASES={
+            'default': {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': ':memory:',
+            },
+        },
+    )
+    django.setup()
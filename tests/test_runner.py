@@ -1,7 +1,182 @@
 from .context import *
 
+import argparse
+import json
+import os
+import pickle
+import time
+import tracemalloc
+import shutil
+import tempfile
 import unittest
-from django_bench_runner.runner import BenchRunner, Bcolors, get_color
+from functools import partial
+from django.core.signals import request_finished, request_started
+from django.core.management.commands import flush
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save
+from django.template import Context, Engine
+from django.test import TransactionTestCase
+from django_bench_runner.budgets import Budgets, budget
+from django_bench_runner.client import RequestCollector
+from django_bench_runner.collectors import Collector
+from django_bench_runner.cpu import CpuCollector
+from django_bench_runner.databases import DatabaseTimer
+from django_bench_runner.exports import build_report, write_junit
+from django_bench_runner.history import BenchHistory
+from django_bench_runner.imports import ImportTimer
+from django_bench_runner.memory import MemoryCollector
+from django_bench_runner.parallel import BenchRemoteTestRunner
+from django_bench_runner.phases import PhaseCollector
+from django_bench_runner.profiling import ProfileCollector
+from django_bench_runner.queries import QueryCollector, fingerprint
+from django_bench_runner.rollup import app_name
+from django_bench_runner.sampling import SamplingProfiler
+from django_bench_runner.snapshots import DatabaseSnapshots
+from django_bench_runner.stream import RecordStream
+from django_bench_runner.suite import BenchTestSuite
+from django_bench_runner.table import Table
+from django_bench_runner.timings import (
+    merge_timings, partition_by_timing, run_stats, shard_tests,
+    shard_timings_path
+)
+from django_bench_runner.trace import Trace
+from django_bench_runner.transactions import TransactionCollector
+from django_bench_runner.writes import WriteCollector
+from django_bench_runner.runner import (
+    BenchRunner, BenchTextTestRunner, Bcolors, get_color, iter_tests,
+    repeat_tests
+)
+
+
+class SampleTests(unittest.TestCase):
+
+    def test_one_query(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+
+    def test_no_query(self):
+        pass
+
+    def test_repeated_query(self):
+        with connection.cursor() as cursor:
+            for number in range(4):
+                cursor.execute("SELECT %s, 'a'", [number])
+            cursor.execute("SELECT 2")
+
+
+class OtherTests(unittest.TestCase):
+
+    def test_a(self):
+        pass
+
+    def test_b(self):
+        pass
+
+
+class PhaseTests(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = ['setUp']
+
+    def test_body(self):
+        self.calls.append('body')
+
+    @unittest.skip('skipped')
+    def test_skipped(self):
+        pass
+
+
+class ClassFixtureTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.ready = True
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.ready = False
+
+    def test_ready(self):
+        self.assertTrue(self.ready)
+
+
+class RequestTests(unittest.TestCase):
+
+    def test_request(self):
+        engine = Engine(loaders=[('django.template.loaders.locmem.Loader', {
+            'outer.html': '<ul>{% include "inner.html" %}</ul>',
+            'inner.html': '<li>{{ item }}</li>',
+        })])
+        request_started.send(sender=None)
+        engine.get_template('outer.html').render(Context({'item': 1}))
+        request_finished.send(sender=None)
+
+
+class BusyTests(unittest.TestCase):
+
+    def test_busy(self):
+        start = time.time()
+        while time.time() - start < 0.1:
+            sum(range(1000))
+
+    def test_allocate(self):
+        self.kept = [str(number) for number in range(50000)]
+
+    def test_sleep(self):
+        time.sleep(0.1)
+
+    def test_skip(self):
+        self.skipTest("not today")
+
+
+class FlushTests(TransactionTestCase):
+
+    def test_query(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+
+
+class CommitTests(TransactionTestCase):
+
+    def test_on_commit(self):
+        with transaction.atomic(durable=True):
+            transaction.on_commit(lambda: None)
+
+
+class Widget(object):
+
+    class _meta:
+        label = 'tests.Widget'
+
+
+class WriteTests(unittest.TestCase):
+
+    def test_writes(self):
+        for number in range(3):
+            post_save.send(sender=Widget, instance=None, created=True)
+        post_save.send(sender=Widget, instance=None, created=False)
+        post_save.send(sender=Widget, instance=None, created=True, raw=True)
+        post_delete.send(sender=Widget, instance=None)
+
+
+@budget(0.01, total=0.05)
+class BudgetTests(unittest.TestCase):
+
+    def test_slow(self):
+        time.sleep(0.03)
+
+    @budget(1)
+    def test_allowed(self):
+        time.sleep(0.03)
+
+
+def run_bench(*tests, **kwargs):
+    """Run tests through the bench runner, returning result and output."""
+    stream = StringIO()
+    runner = BenchTextTestRunner(stream=stream, benchmark=True, **kwargs)
+    result = runner.run(BenchTestSuite(tests))
+    return result, stream.getvalue()
+
 
 class BenchRunnerSuite(unittest.TestCase):
 
@@ -12,12 +187,570 @@ class BenchRunnerSuite(unittest.TestCase):
         b = BenchRunner()
         self.assertEqual(b.benchmark, False)
 
+    def test_add_arguments(self):
+        """The options fit next to DiscoverRunner's own, -b included."""
+        parser = argparse.ArgumentParser()
+        BenchRunner.add_arguments(parser)
+        options = parser.parse_args(['--benchmark', '-b'])
+        self.assertTrue(options.benchmark)
+        self.assertTrue(options.buffer)
 
     def test_colors(self):
         self.assertEqual(get_color(5, 5), Bcolors.RED)
         self.assertEqual(get_color(.2, 5), Bcolors.GREEN)
 
 
+    def test_query_collector(self):
+        result, output = run_bench(
+            SampleTests('test_one_query'), SampleTests('test_no_query'),
+            collectors=[QueryCollector()],
+        )
+        records = list(result.bench_dict.values())
+        self.assertEqual(records[0]['queries'], 1)
+        self.assertEqual(records[1]['queries'], 0)
+        self.assertIn('Slowest query', output)
+        self.assertEqual(connection.execute_wrappers, [])
+
+    def test_repeated_queries(self):
+        self.assertEqual(
+            fingerprint("SELECT  *\nFROM t WHERE id IN (%s, %s) AND x = 'b'"),
+            "SELECT * FROM t WHERE id IN (...) AND x = ?"
+        )
+        test = SampleTests('test_repeated_query')
+        result, output = run_bench(
+            test, collectors=[QueryCollector(repeat_threshold=3)]
+        )
+        [(sql, runs, site)] = result.bench_dict[test.id()]['repeated_queries']
+        self.assertEqual(sql, "SELECT ?, ?")
+        self.assertEqual(runs, 4)
+        self.assertIn('test_runner.py:', site)
+        self.assertIn('Repeated queries', output)
+
+    def test_parallel_records(self):
+        """
+        Records made in a worker survive pickling and replace the ones
+        made while replaying its events.
+        """
+        runner = pickle.loads(pickle.dumps(partial(
+            BenchRemoteTestRunner, benchmark=True, collectors=[QueryCollector()]
+        )))()
+        tests = [
+            ClassFixtureTests('test_ready'),
+            SampleTests('test_one_query'), SampleTests('test_no_query'),
+        ]
+        events = pickle.loads(pickle.dumps(
+            runner.run(BenchTestSuite(tests)).events
+        ))
+        bench_events = [e for e in events if e[0] == 'addBench']
+        self.assertEqual(len(bench_events), 3)
+        self.assertEqual(bench_events[1][2]['queries'], 1)
+        # Set up before any test started, so its index is of no use
+        self.assertEqual(events[0][:3], (
+            'addRemoteClassBench', -1, __name__ + '.ClassFixtureTests'
+        ))
+
+        result, output = run_bench()
+        for event in events:
+            getattr(result, event[0])(tests[event[1]], *event[2:])
+        result.stopTestRun()
+        records = list(result.bench_dict.values())
+        self.assertEqual(records[1]['queries'], 1)
+        self.assertIn('worker', records[1])
+        self.assertIn('Worker', result.stream.getvalue())
+        self.assertIn('setup', result.class_dict[__name__ + '.ClassFixtureTests'])
+
+
+    def test_partition_by_timing(self):
+        subsuites = [
+            unittest.TestSuite([SampleTests('test_one_query')]),
+            unittest.TestSuite([SampleTests('test_no_query')]),
+            unittest.TestSuite([OtherTests('test_a'), OtherTests('test_b')]),
+        ]
+        prefix = __name__ + '.'
+        timings = {
+            prefix + 'SampleTests.test_one_query': 10,
+            prefix + 'SampleTests.test_no_query': 4,
+            prefix + 'OtherTests.test_a': 3,
+        }
+        partitions = partition_by_timing(subsuites, 2, timings)
+        self.assertEqual(
+            [[test.id()[len(prefix):] for test in p] for p in partitions],
+            [
+                # test_b was never timed and counts as the median, 4.
+                # Classes keep their original order within a partition.
+                ['SampleTests.test_no_query', 'OtherTests.test_a',
+                 'OtherTests.test_b'],
+                ['SampleTests.test_one_query'],
+            ]
+        )
+
+
+    def test_exports(self):
+        result, output = run_bench(
+            SampleTests('test_one_query'), SampleTests('test_no_query'),
+            BusyTests('test_skip'), SampleTests('test_repeated_query'),
+            collectors=[QueryCollector(repeat_threshold=3)]
+        )
+        report = build_report(result)
+        self.assertEqual(report['tests'], 4)
+        [module] = report['modules']
+        self.assertEqual(module['tests'], 4)
+        sample, busy = module['classes']
+        self.assertEqual(sample['metrics']['queries'], 6)
+        self.assertEqual(
+            [test['metrics']['queries'] for test in sample['tests']], [1, 0, 5]
+        )
+        # Data beyond the table's columns is exported, bookkeeping isn't
+        data = sample['tests'][2]['data']
+        sql, runs = data['repeated_queries'][0][:2]
+        self.assertEqual((sql, runs), ("SELECT ?, ?", 4))
+        self.assertNotIn('start', data)
+        self.assertNotIn('queries', data)
+        self.assertEqual(busy['tests'][0]['outcome'], 'skipped')
+        self.assertAlmostEqual(
+            report['runtime'], sample['runtime'] + busy['runtime']
+        )
+        json.dumps(report)
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'report.xml')
+        write_junit(path, report)
+        with open(path) as f:
+            xml = f.read()
+        self.assertIn('<testsuite name="{}.BusyTests"'.format(__name__), xml)
+        self.assertIn('skipped="1"', xml)
+        self.assertIn('<skipped message="not today">', xml)
+        self.assertIn('<property name="queries" value="1" />', xml)
+        self.assertIn('<property name="repeated_queries" value="[[', xml)
+
+    def test_shard_tests(self):
+        tests = [
+            SampleTests('test_one_query'), SampleTests('test_no_query'),
+            OtherTests('test_a'), OtherTests('test_b'), PhaseTests('test_body'),
+        ]
+        prefix = __name__ + '.'
+        timings = {
+            prefix + 'SampleTests.test_one_query': 5,
+            prefix + 'SampleTests.test_no_query': 5,
+            prefix + 'OtherTests.test_a': 4,
+            prefix + 'OtherTests.test_b': 4,
+            prefix + 'PhaseTests.test_body': 1,
+        }
+        shards = [shard_tests(tests, index, 2, timings) for index in (1, 2)]
+        self.assertEqual(
+            [[test.id()[len(prefix):] for test in shard] for shard in shards],
+            [
+                ['SampleTests.test_one_query', 'SampleTests.test_no_query'],
+                ['OtherTests.test_a', 'OtherTests.test_b',
+                 'PhaseTests.test_body'],
+            ]
+        )
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'timings.json')
+        self.assertEqual(
+            shard_timings_path(path, 2), os.path.join(directory, 'timings.2.json')
+        )
+        with open(path, 'w') as f:
+            f.write('{"old": 1, "a": 1}')
+        for index, shard in enumerate(({'a': 2}, {'b': 3}), 1):
+            with open(shard_timings_path(path, index), 'w') as f:
+                f.write(json.dumps(shard))
+        merged = merge_timings(
+            path, [shard_timings_path(path, index) for index in (1, 2)]
+        )
+        self.assertEqual(merged, {'old': 1, 'a': 2, 'b': 3})
+
+        # Shards are built without --benchmark too
+        labels = [prefix + 'SampleTests', prefix + 'OtherTests']
+        shards = [
+            [test.id() for test in iter_tests(
+                BenchRunner(bench_shard=(index, 2)).build_suite(labels)
+            )]
+            for index in (1, 2)
+        ]
+        self.assertTrue(all(shards))
+        self.assertEqual(
+            sorted(shards[0] + shards[1]),
+            sorted(
+                test.id()
+                for test in iter_tests(BenchRunner().build_suite(labels))
+            )
+        )
+
+    def test_history_regressions(self):
+        history = BenchHistory(':memory:', factor=1.5)
+        for runtime in (1.0, 1.1, 0.9):
+            history.record({'a.B.test': {'runtime': runtime}})
+        self.assertEqual(history.baseline('a.B.test'), 1.0)
+        self.assertIsNone(history.baseline('a.B.other'))
+        self.assertEqual(
+            history.find_regressions({
+                'a.B.test': {'runtime': 2.0},
+                'a.B.other': {'runtime': 9.0},
+            }),
+            [('a.B.test', 2.0, 1.0)]
+        )
+        self.assertEqual(
+            history.find_regressions({'a.B.test': {'runtime': 1.2}}), []
+        )
+
+
+    def test_phase_collector(self):
+        body, skipped = PhaseTests('test_body'), PhaseTests('test_skipped')
+        result, output = run_bench(
+            body, skipped, collectors=[PhaseCollector()]
+        )
+        self.assertEqual(len(result.skipped), 1)
+        self.assertEqual(body.calls, ['setUp', 'body'])
+        self.assertNotIn('setUp', body.__dict__)
+        record = result.bench_dict[body.id()]
+        self.assertGreater(record['setup'], 0)
+        self.assertGreater(record['body'], 0)
+        self.assertIn('tearDown', output)
+
+        class FailingTests(unittest.TestCase):
+            def test_fail(self):
+                self.fail('failed')
+
+        result, output = run_bench(
+            FailingTests('test_fail'), collectors=[PhaseCollector()]
+        )
+        traceback = result.failures[0][1]
+        self.assertIn('failed', traceback)
+        self.assertNotIn('phases.py', traceback)
+
+
+    def test_class_setup_rows(self):
+        result, output = run_bench(
+            ClassFixtureTests('test_ready'), SampleTests('test_no_query')
+        )
+        self.assertTrue(result.wasSuccessful())
+        class_record = result.class_dict[__name__ + '.ClassFixtureTests']
+        self.assertIn('setup', class_record)
+        self.assertIn('teardown', class_record)
+        self.assertEqual(class_record['fixtures'], {})
+        self.assertIn('+ setUpClass', output)
+        self.assertIn('+ tearDownClass', output)
+        self.assertNotIn('setUpTestData', output)
+
+
+    def test_rollup_and_top(self):
+        result, output = run_bench(
+            SampleTests('test_one_query'), SampleTests('test_no_query'),
+            OtherTests('test_a'), OtherTests('test_b'), top=1, rollup=True,
+        )
+        self.assertIn('(1 more classes)', output)
+        self.assertEqual(output.count('more tests)'), 1)
+        totals = result.rollup.totals
+        self.assertEqual(totals['Module'][__name__][0], 4)
+        self.assertEqual(totals['App'][__name__.split('.')[0]][0], 4)
+        for header in ('App', 'Package', 'Module', 'Class'):
+            self.assertIn(header + ' ', output)
+
+    def test_table(self):
+        table = Table(["Test", "Runtime"], ('left', 'right'))
+        table.extend([
+            {},
+            {"Test": ("module.Class", Bcolors.BLUE)},
+            {"Test": ": test_a", "Runtime": ("12.00000", Bcolors.RED)},
+        ])
+        self.assertEqual(list(table.lines()), [
+            "Test            Runtime",
+            "------------  ---------",
+            "",
+            Bcolors.BLUE + "module.Class" + Bcolors.END,
+            ": test_a       " + Bcolors.RED + "12.00000" + Bcolors.END,
+        ])
+
+    def test_trace(self):
+        result, output = run_bench(
+            ClassFixtureTests('test_ready'), PhaseTests('test_body'),
+            collectors=[PhaseCollector()]
+        )
+        trace = Trace(None)
+        with trace.span('run tests'):
+            trace.add_tests(result.bench_dict, result.class_dict)
+        events = trace.events()
+        names = [event['name'] for event in events]
+        self.assertEqual(names[0], 'thread_name')
+        self.assertIn(__name__ + '.ClassFixtureTests', names)
+        self.assertIn('setUpClass', names)
+        self.assertIn('tearDownClass', names)
+
+        spans = dict(
+            (event['name'], event) for event in events if event['ph'] == 'X'
+        )
+        test, body = spans['test_body'], spans['body']
+        self.assertEqual(test['cat'], 'test')
+        self.assertGreaterEqual(body['ts'], test['ts'])
+        self.assertLessEqual(
+            body['ts'] + body['dur'], test['ts'] + test['dur'] + 1
+        )
+        # Spans are relative to the earliest one
+        self.assertEqual(min(event['ts'] for event in spans.values()), 0)
+
+    def test_database_timer(self):
+        timer = DatabaseTimer()
+        creation = connection.creation
+        with timer.setting_up():
+            old_name = creation.create_test_db(
+                verbosity=0, autoclobber=True, serialize=False
+            )
+        with timer.tearing_down():
+            creation.destroy_test_db(old_name, verbosity=0)
+        self.assertEqual(
+            [step[:2] for step in timer.steps],
+            [('default', 'create'), ('default', 'destroy')]
+        )
+        self.assertNotIn('create_test_db', creation.__dict__)
+        self.assertGreater(timer.setup, 0)
+
+
+    def test_database_snapshots(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        snapshots = DatabaseSnapshots(directory)
+
+        def migrate(command, **options):
+            with connection.cursor() as cursor:
+                cursor.execute("CREATE TABLE snapshot_test (id integer)")
+
+        snapshots.migrate(migrate, None, (), {'database': 'default'})
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TABLE snapshot_test")
+        snapshots.migrate(None, None, (), {'database': 'default'})
+        self.addCleanup(connection.cursor().execute, "DROP TABLE snapshot_test")
+
+        self.assertEqual(
+            [result[:2] for result in snapshots.results],
+            [('default', 'miss'), ('default', 'hit')]
+        )
+        self.assertIn('snapshot_test', connection.introspection.table_names())
+
+
+    def test_import_timer(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        sys.path.insert(0, directory)
+        self.addCleanup(sys.path.remove, directory)
+        with open(os.path.join(directory, 'bench_outer.py'), 'w') as f:
+            f.write("import bench_inner\nimport os\n")
+        with open(os.path.join(directory, 'bench_inner.py'), 'w') as f:
+            f.write("")
+
+        with ImportTimer() as timer:
+            import bench_outer
+        self.assertEqual(sorted(timer.inclusive), ['bench_inner', 'bench_outer'])
+        self.assertLess(
+            timer.exclusive['bench_outer'], timer.inclusive['bench_outer']
+        )
+        self.assertGreater(timer.build_time, 0)
+
+
+    def test_record_stream(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'bench.jsonl')
+        result, output = run_bench(
+            SampleTests('test_one_query'), ClassFixtureTests('test_ready'),
+            bench_stream=path,
+        )
+        with open(path) as f:
+            lines = f.read().splitlines()
+        # Start and finish of each test, setup and teardown of each class
+        self.assertEqual(len(lines), 8)
+        self.assertEqual(
+            list(result.bench_dict),
+            [SampleTests('test_one_query').id(), ClassFixtureTests('test_ready').id()]
+        )
+        self.assertIn('+ setUpClass', output)
+
+        # A cut off last line is skipped, with a warning
+        with open(path, 'a') as f:
+            f.write('{"test": "cut')
+        with self.assertWarns(UserWarning) as caught:
+            bench_dict, class_dict = RecordStream(path).load()
+        self.assertEqual(len(bench_dict), 2)
+        self.assertIn('line(s) of {}: 9'.format(path), str(caught.warning))
+
+
+    def test_profile_collector(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        seen = []
+
+        class Spy(Collector):
+            def stop_test(self, test, record):
+                seen.append('hotspots' in record)
+
+        # Stats are built once the collectors stopped before it are done
+        result, output = run_bench(
+            SampleTests('test_one_query'),
+            collectors=[Spy(), ProfileCollector(directory, threshold=0)],
+        )
+        self.assertEqual(seen, [False])
+        record = result.bench_dict[SampleTests('test_one_query').id()]
+        self.assertTrue(os.path.exists(record['profile']))
+        self.assertTrue(record['hotspots'])
+        self.assertIn('> ' + record['hotspots'][0][0], output)
+
+
+    def test_sampling_profiler(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'folded.txt')
+        sampler = SamplingProfiler(path, interval=0.001)
+        result, output = run_bench(BusyTests('test_busy'), collectors=[sampler])
+        self.assertFalse(sampler.running)
+        self.assertIn('Hotspots', output)
+        with open(path) as f:
+            line = f.readline()
+        self.assertTrue(line.startswith(BusyTests('test_busy').id() + ';'))
+        self.assertIn('test_busy (', line)
+
+
+    def test_memory_collector(self):
+        test = BusyTests('test_allocate')
+        result, output = run_bench(
+            test, collectors=[MemoryCollector(threshold=1)]
+        )
+        record = result.bench_dict[test.id()]
+        self.assertGreater(record['peak_memory'], 1)
+        label, size = record['allocations'][0]
+        self.assertIn('test_runner.py', label)
+        self.assertIn('Peak MB', output)
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_request_collector(self):
+        test = RequestTests('test_request')
+        result, output = run_bench(test, collectors=[RequestCollector()])
+        record = result.bench_dict[test.id()]
+        self.assertEqual(record['requests'], 1)
+        self.assertGreaterEqual(record['request_time'], record['render_time'])
+        outer = record['templates']['outer.html']
+        inner = record['templates']['inner.html']
+        self.assertEqual(outer[0], 1)
+        self.assertAlmostEqual(outer[1], record['render_time'])
+        self.assertAlmostEqual(outer[2], outer[1] - inner[1])
+        self.assertIn('> outer.html', output)
+        self.assertIn('Slowest templates', output)
+
+    def test_cpu_collector(self):
+        busy = BusyTests('test_busy')
+        sleep = BusyTests('test_sleep')
+        result, output = run_bench(busy, sleep, collectors=[CpuCollector()])
+        busy_record = result.bench_dict[busy.id()]
+        sleep_record = result.bench_dict[sleep.id()]
+        self.assertEqual(busy_record['bound'], 'cpu')
+        self.assertEqual(sleep_record['bound'], 'wait')
+        self.assertGreater(sleep_record['wait_time'], 0.05)
+        self.assertGreater(busy_record['cpu_time'], sleep_record['cpu_time'])
+        self.assertIn('mixed', output)
+
+    def test_transaction_collector(self):
+        handle = flush.Command.handle
+        result, output = run_bench(
+            FlushTests('test_query'), CommitTests('test_on_commit'),
+            collectors=[TransactionCollector()]
+        )
+        self.assertTrue(result.wasSuccessful())
+        flushed = result.class_dict[__name__ + '.FlushTests']
+        committed = result.class_dict[__name__ + '.CommitTests']
+        self.assertEqual(flushed['transaction_tests'], 1)
+        self.assertGreater(flushed['flush_time'], 0)
+        self.assertEqual(flushed['transaction_uses'], [])
+        self.assertEqual(
+            committed['transaction_uses'], ['durable atomic', 'on_commit']
+        )
+        self.assertIn('+ flush', output)
+        self.assertIn('Could be TestCase', output)
+        self.assertIn('CommitTests (durable atomic, on_commit)', output)
+        self.assertIs(flush.Command.handle, handle)
+
+    def test_write_collector(self):
+        test = WriteTests('test_writes')
+        result, output = run_bench(
+            test, collectors=[WriteCollector(bulk_threshold=3)]
+        )
+        record = result.bench_dict[test.id()]
+        self.assertEqual(record['writes'], {'tests.Widget': [3, 1, 1]})
+        self.assertEqual(
+            (record['created'], record['updated'], record['deleted']),
+            (3, 1, 1)
+        )
+        self.assertIn('> bulk_create tests.Widget (3 saves)', output)
+        self.assertIn('Model writes', output)
+        self.assertFalse(post_save.has_listeners(Widget))
+
+    def test_budgets(self):
+        result, output = run_bench(
+            BudgetTests('test_slow'), BudgetTests('test_allowed'),
+            BusyTests('test_sleep'),
+            budgets=Budgets({'APPS': {app_name(__name__): {'TEST': 0.05}}})
+        )
+        self.assertTrue(result.wasSuccessful())
+        labels = [label for label, runtime, budget in result.over_budget]
+        self.assertEqual(labels, [
+            BudgetTests('test_slow').id(), __name__ + '.BudgetTests',
+            BusyTests('test_sleep').id(),
+        ])
+        self.assertEqual(result.over_budget[0][2], 0.01)
+        self.assertIn('Over budget', output)
+        self.assertIn('3 over budget, failing the run', output)
+
+        result, output = run_bench(
+            BudgetTests('test_slow'), budgets=Budgets({}), soft_budgets=True
+        )
+        self.assertEqual(len(result.over_budget), 1)
+        self.assertIn('Over budget', output)
+        self.assertNotIn('failing the run', output)
+
+    def test_repeat(self):
+        stats = run_stats([4.0, 1.0, 3.0, 2.0])
+        self.assertEqual(stats['min'], 1.0)
+        self.assertEqual(stats['median'], 2.5)
+        self.assertEqual(stats['p95'], 4.0)
+        self.assertAlmostEqual(stats['stddev'], 1.29099, places=5)
+
+        test = BusyTests('test_sleep')
+        suite = repeat_tests(BenchTestSuite([OtherTests('test_a'), test]), 3)
+        tests = list(iter_tests(suite))
+        self.assertEqual(len(tests), 6)
+        self.assertEqual(len(set(id(test) for test in tests)), 6)
+
+        result, output = run_bench(*tests)
+        self.assertNotIn('runs', result.bench_dict[test.id()])
+        self.assertEqual(result.runs, {})
+
+        result, output = run_bench(*tests, repeat=True)
+        record = result.bench_dict[test.id()]
+        self.assertEqual(len(record['runs']), 3)
+        self.assertEqual(record['runtime'], record['median'])
+        self.assertGreaterEqual(record['p95'], record['median'])
+        self.assertIn('P95', output)
+
+        stats = {'runs': [0, 0], 'median': 0, 'cv': 0.5}
+        result.bench_dict = {
+            'fast': dict(stats, stddev=0.0001),
+            'slow': dict(stats, stddev=0.05),
+        }
+        result.write_unstable()
+        unstable = result.stream.getvalue()[len(output):]
+        self.assertIn('slow', unstable)
+        self.assertNotIn('fast', unstable)
+
+        # A module that fails to import is reported on every run
+        failed = unittest.defaultTestLoader.loadTestsFromName(
+            'bench_no_such_module'
+        )
+        result, output = run_bench(*iter_tests(repeat_tests(failed, 2)))
+        self.assertEqual(len(result.errors), 2)
+        self.assertIn('bench_no_such_module', result.errors[0][1])
+
+
 def suite():
     suite = unittest.TestSuite()
     suite.addTest(unittest.makeSuite(BenchRunnerSuite))